@@ -1,14 +1,10 @@
 import streamlit as st
-from PIL import Image
-import numpy as np
 import pytesseract
 
-def extract_text_from_image(image_path):
-    input_image = Image.open(image_path)
-    input_array = np.array(input_image)
-    output_image = Image.fromarray(input_array)
+from utils.image_utils import decode_upload
 
-    raw_text = pytesseract.image_to_string(output_image)
+def extract_text_from_image(image):
+    raw_text = pytesseract.image_to_string(image)
     cleaned_text = raw_text.replace("-", "").replace("=", "")
     return cleaned_text
 
@@ -19,13 +15,14 @@ def main():
     uploaded_file = st.file_uploader("Choose an image...", type=["png", "jpg", "jpeg"])
     
     if uploaded_file is not None:
-        # Save the uploaded file temporarily
-        image_path = "temp_image.png"
-        with open(image_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # Decode the upload in memory, nothing is written to a shared path
+        image = decode_upload(uploaded_file)
+        if image is None:
+            st.error("Could not decode the uploaded image")
+            return
         
         # Extract text from the uploaded image
-        extracted_text = extract_text_from_image(image_path)
+        extracted_text = extract_text_from_image(image)
         
         # Display the extracted text in a textarea
         st.text_area("Extracted Text", extracted_text, height=300)
@@ -1,9 +1,14 @@
 import streamlit as st
 from PIL import Image
 import os
-from utils.image_utils import load_image, get_image_details, capture_photo
-from utils.ocr_utils import extract_text, save_text, preprocess_image
-from utils.doc_utils import create_word_document, get_document_bytes
+from utils.image_utils import decode_upload, load_image, get_image_details, capture_photo
+from utils.ocr_utils import extract_text, save_text, preprocess_image, resolve_preprocessing_options, get_engine_load_times, loaded_engine
+from utils.cache_utils import RESULT_CACHE
+from utils.doc_utils import build_document_bytes
+from utils.batch_utils import BatchJob, BATCH_WORKERS
+from utils.tile_utils import extract_text_tiled, combine_tiles, TILED_MIN_HEIGHT
+from utils.easyocr_utils import describe_config as describe_easyocr_config
+from utils.capture_utils import get_capture_session
 
 # Initialize state
 if 'is_dark_theme' not in st.session_state:
@@ -63,9 +68,129 @@ else:
     for key, value in light_theme.items():
         st.config.set_option(f'theme.{key}', value)
 
+LANGUAGE_NAMES = {
+    "eng": "English",
+    "fra": "French",
+    "deu": "German",
+    "spa": "Spanish",
+    "hin": "Hindi"
+}
+
+@st.fragment(run_every=1.0)
+def show_batch_progress():
+    """
+    Poll the running batch job and render its progress without blocking reruns
+    """
+    job = st.session_state.get('batch_job')
+    if job is None:
+        return
+    
+    done = job.poll()
+    st.progress(done / job.total if job.total else 1.0, text=f"{done} of {job.total} pages processed")
+    for name, message in job.errors.items():
+        st.warning(f"{name}: {message}")
+    
+    for label, result in zip(job.labels, job.results):
+        if result is not None:
+            with st.expander(f"{label} ({result['confidence']:.1f}%)"):
+                st.text(result['text'])
+    
+    # Streamlit reads the spooled file itself, the job keeps no copy of its bytes
+    doc_file = job.document_file() if job.total else None
+    if doc_file is not None:
+        st.download_button(
+            "📥 Download Batch as Word",
+            doc_file,
+            "batch_document.docx",
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+            use_container_width=True
+        )
+
+def render_batch_mode():
+    """
+    Multi-file upload that OCRs every page on the worker process pool
+    """
+    uploaded_files = st.file_uploader(
+        "Drop image, TIFF or PDF files here",
+        type=['png', 'jpg', 'jpeg', 'tif', 'tiff', 'pdf'],
+        accept_multiple_files=True,
+        label_visibility="collapsed"
+    )
+    
+    set_col1, set_col2, set_col3 = st.columns(3)
+    with set_col1:
+        lang = st.selectbox("Language", list(LANGUAGE_NAMES), format_func=LANGUAGE_NAMES.get, key="batch_lang")
+    with set_col2:
+        ocr_mode = st.radio("OCR Mode", ["Fast", "Accurate"], horizontal=True, key="batch_mode_select")
+    with set_col3:
+        workers = st.number_input("Workers", min_value=1, max_value=32, value=BATCH_WORKERS, help="Pages of this batch processed at once on the shared worker pool")
+    
+    run_col, cancel_col = st.columns(2)
+    with run_col:
+        if st.button("Start Batch 🔍", type="primary", use_container_width=True, disabled=not uploaded_files):
+            if st.session_state.get('batch_job') is not None:
+                st.session_state.batch_job.close()
+            st.session_state.batch_job = BatchJob(
+                [(f.name, f.getvalue()) for f in uploaded_files],
+                lang=lang,
+                mode=ocr_mode,
+                workers=int(workers)
+            )
+    with cancel_col:
+        job = st.session_state.get('batch_job')
+        if st.button("Cancel", use_container_width=True, disabled=job is None or job.finished):
+            job.cancel()
+    
+    show_batch_progress()
+
+@st.fragment(run_every=1.0)
+def show_live_scan():
+    """
+    Recognize the camera view about once a second; OCR only runs again
+    when the sharpest recent frame differs from the last one recognized
+    """
+    session = get_capture_session()
+    frame, result, _ = session.recognize(
+        lang=st.session_state.get('live_lang', 'eng'),
+        mode='Fast',
+        strategy='cascade'
+    )
+    if frame is None:
+        st.error("Failed to read from the camera. Please check your camera.")
+        return
+    st.image(frame, caption='Live view', width=400)
+    if result is not None:
+        st.text_area("Live text", result['text'], height=200)
+    stats = session.get_stats()
+    st.caption(f"OCR runs: {stats['ocr_runs']} · unchanged frames skipped: {stats['ocr_skipped']}")
+
+def show_diagnostics(result, timings):
+    """
+    Per-stage timing and memory numbers for the current request
+    """
+    with st.expander("🔧 Diagnostics"):
+        if result.get('cached'):
+            st.caption("Served from the result cache")
+        st.table([
+            {
+                'Stage': name,
+                'Wall (ms)': round(numbers['wall_ms'], 1),
+                'CPU (ms)': round(numbers['cpu_ms'], 1),
+                'Peak RSS +MB': round(numbers['peak_rss_delta_mb'], 1) if numbers['peak_rss_delta_mb'] is not None else None
+            }
+            for name, numbers in timings.items()
+        ])
+        if 'preprocessing' in result:
+            st.write("Preprocessing:", result['preprocessing'])
+        st.write("Image copies:", result.get('copies', {}))
+        if 'blocks' in result:
+            st.write("Text blocks (reading order):", [block['box'] for block in result['blocks']])
+        st.write("Engine load times (s):", get_engine_load_times())
+        st.write("Result cache:", RESULT_CACHE.get_stats())
+
 def main():
     # Initialize OCR status message
-    st.info("Using EasyOCR engine (CPU mode)")
+    st.info(f"Using EasyOCR engine ({describe_easyocr_config(loaded_engine('easyocr'))})")
     
     # Header with title and theme toggle
     header_container = st.container()
@@ -97,23 +222,52 @@ def main():
         
         with col1:
             # Action buttons at the top
-            btn_col1, btn_col2 = st.columns(2)
+            btn_col1, btn_col2, btn_col3 = st.columns(3)
             with btn_col1:
                 if st.button("📁 Upload Image", use_container_width=True, type="primary"):
                     st.session_state.capture_mode = False
+                    st.session_state.batch_mode = False
             with btn_col2:
                 if st.button("📸 Capture Photo", use_container_width=True):
                     st.session_state.capture_mode = True
+                    st.session_state.batch_mode = False
+            with btn_col3:
+                if st.button("🗂️ Batch Scan", use_container_width=True):
+                    st.session_state.capture_mode = False
+                    st.session_state.batch_mode = True
                     
             # Main input area
-            if st.session_state.get('capture_mode', False):
+            if st.session_state.get('batch_mode', False):
+                render_batch_mode()
+            elif st.session_state.get('capture_mode', False):
                 # Camera capture interface
                 if st.button("Take Photo", type="primary", use_container_width=True):
-                    image = capture_photo()
-                    if image is not None:
-                        st.image(image, caption='Captured Image', width=400)
-                    else:
+                    st.session_state.captured_image = capture_photo()
+                    if st.session_state.captured_image is None:
                         st.error("Failed to capture image. Please check your camera.")
+                
+                # Keep the photo across reruns so it can be processed below
+                if st.session_state.get('captured_image') is not None:
+                    image_format = None
+                    image = st.session_state.captured_image
+                    st.image(image, caption='Captured Image', width=400)
+                
+                live_col1, live_col2 = st.columns([2, 1])
+                with live_col1:
+                    live_scan = st.toggle(
+                        "Live scan",
+                        help="Keep the camera open and re-run OCR only when the view changes"
+                    )
+                with live_col2:
+                    st.selectbox(
+                        "Language",
+                        list(LANGUAGE_NAMES),
+                        format_func=LANGUAGE_NAMES.get,
+                        key="live_lang",
+                        label_visibility="collapsed"
+                    )
+                if live_scan:
+                    show_live_scan()
             else:
                 # File upload interface
                 uploaded_file = st.file_uploader(
@@ -123,7 +277,12 @@ def main():
                 )
                 
                 if uploaded_file is not None:
-                    image = load_image(uploaded_file)
+                    # Decode straight from the upload buffer into one array,
+                    # PIL is only needed for formats OpenCV cannot read
+                    image_format = uploaded_file.name.rsplit('.', 1)[-1].upper()
+                    image = decode_upload(uploaded_file)
+                    if image is None:
+                        image = load_image(uploaded_file)
                     st.image(image, caption='Uploaded Image', width=400)
 
         # Show image details and OCR controls in the side column
@@ -132,7 +291,7 @@ def main():
                 with st.container():
                     # Image Details
                     st.subheader("Image Details")
-                    details = get_image_details(image)
+                    details = get_image_details(image, image_format)
                     st.write(f"Format: {details['format']}")
                     st.write(f"Size: {details['size'][0]}x{details['size'][1]}")
                     st.write(f"Mode: {details['mode']}")
@@ -145,6 +304,11 @@ def main():
                         apply_grayscale = st.checkbox("Convert to Grayscale", value=True)
                         apply_denoise = st.checkbox("Remove Noise", value=True)
                         apply_contrast = st.checkbox("Enhance Contrast", value=False)
+                        apply_layout = st.checkbox(
+                            "Detect Text Regions",
+                            value=True,
+                            help="Only recognize the text blocks on the page, skipping margins and pictures"
+                        )
                         if apply_contrast:
                             contrast_level = st.slider("Contrast Level", 1.0, 3.0, 1.5, 0.1)
 
@@ -152,14 +316,8 @@ def main():
                     st.subheader("OCR Settings")
                     lang = st.selectbox(
                         "Language",
-                        ["eng", "fra", "deu", "spa", "hin"],
-                        format_func=lambda x: {
-                            "eng": "English",
-                            "fra": "French",
-                            "deu": "German",
-                            "spa": "Spanish",
-                            "hin": "Hindi"
-                        }[x]
+                        list(LANGUAGE_NAMES),
+                        format_func=LANGUAGE_NAMES.get
                     )
 
                     # OCR Mode
@@ -170,6 +328,13 @@ def main():
                         help="Fast mode is quicker but may be less accurate"
                     )
                     
+                    # Tiled mode keeps memory bounded on very tall scans
+                    tiled_mode = st.checkbox(
+                        "Tiled mode",
+                        value=details['size'][1] > TILED_MIN_HEIGHT,
+                        help="Process the image in strips and stream text as it is recognized"
+                    )
+                    
                     if st.button("Extract Text 🔍", type="primary", use_container_width=True):
                         with st.spinner("Processing image..."):
                             # Prepare preprocessing options
@@ -177,16 +342,37 @@ def main():
                                 'grayscale': apply_grayscale,
                                 'denoise': apply_denoise,
                                 'contrast': apply_contrast,
-                                'contrast_level': contrast_level if apply_contrast else 1.0
+                                'contrast_level': contrast_level if apply_contrast else 1.0,
+                                'layout': apply_layout
                             }
                             
                             # Process image with selected options
-                            result = extract_text(
-                                image,
-                                lang=lang,
-                                preprocessing_options=preprocessing_options,
-                                mode=ocr_mode
-                            )
+                            if tiled_mode:
+                                stream_placeholder = st.empty()
+                                tiles = []
+                                for tile in extract_text_tiled(
+                                    image,
+                                    lang=lang,
+                                    preprocessing_options=preprocessing_options,
+                                    mode=ocr_mode,
+                                    strategy='concurrent'
+                                ):
+                                    tiles.append(tile)
+                                    stream_placeholder.text_area(
+                                        "Recognized so far",
+                                        '\n'.join(t['text'] for t in tiles if t['text']),
+                                        height=300
+                                    )
+                                stream_placeholder.empty()
+                                result = combine_tiles(tiles, lang) if tiles else None
+                            else:
+                                result = extract_text(
+                                    image,
+                                    lang=lang,
+                                    preprocessing_options=preprocessing_options,
+                                    mode=ocr_mode,
+                                    strategy='concurrent'
+                                )
                             
                             if result:
                                 # Show original and processed images side by side
@@ -197,8 +383,15 @@ def main():
                                     st.image(image, width=200)
                                 with img_col2:
                                     st.markdown("**Processed**")
-                                    processed_img = preprocess_image(image, preprocessing_options)
-                                    st.image(processed_img, width=200)
+                                    processed_img = result.get('processed_image')
+                                    if result.get('tiles'):
+                                        # Tiled runs do not keep a full-page processed image
+                                        st.caption(f"Processed in {result['tiles']} strips")
+                                    else:
+                                        if processed_img is None:
+                                            # Results restored from the disk cache carry no image
+                                            processed_img = preprocess_image(image, resolve_preprocessing_options(preprocessing_options, ocr_mode))
+                                        st.image(processed_img, width=200)
                                 st.subheader("Extracted Text")
                                 
                                 # Show detailed stats
@@ -281,23 +474,29 @@ def main():
                                     if st.button("📋 Copy Text", use_container_width=True):
                                         st.code(edited_text)
                                         st.success("Text copied to clipboard!")
+                                # Stage timings of this request, docx stages added below
+                                request_timings = dict(result.get('timings', {}))
                                 with action_col2:
-                                    # Create and offer Word document for download
-                                    doc = create_word_document(
+                                    # Create and offer Word document for download,
+                                    # reusing the bytes while text and font are unchanged
+                                    doc_bytes = build_document_bytes(
                                         edited_text,
                                         font_name=font_name,
-                                        font_size=font_size
+                                        font_size=font_size,
+                                        timings=request_timings
                                     )
-                                    if doc:
-                                        doc_bytes = get_document_bytes(doc)
-                                        if doc_bytes:
-                                            st.download_button(
-                                                "📥 Download as Word",
-                                                doc_bytes,
-                                                "extracted_document.docx",
-                                                "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                                                use_container_width=True
-                                            )
+                                    if doc_bytes:
+                                        st.download_button(
+                                            "📥 Download as Word",
+                                            doc_bytes,
+                                            "extracted_document.docx",
+                                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                                            use_container_width=True
+                                        )
+                                
+                                # Hidden diagnostics, shown with ?diagnostics=1 in the URL
+                                if st.query_params.get('diagnostics'):
+                                    show_diagnostics(result, request_timings)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,395 @@
+"""
+Headless OCR service and command line interface.
+
+    python app/service.py serve --host 0.0.0.0 --port 8080
+    python app/service.py serve --workers 4
+    python app/service.py ocr scan1.png scan2.jpg --lang eng --json
+    python app/service.py spell-index --words product_codes.txt
+
+HTTP API:
+    POST /ocr?lang=eng&mode=Fast&strategy=cascade
+                                     raw image bytes in the body, JSON result back;
+                                     strategy is sequential, concurrent (default) or cascade
+    GET  /health                     engine status and queue depth
+    GET  /stats                      cache, spell and preprocessing memo, cascade and
+                                     engine latency counters
+    GET  /metrics                    per-stage latency histograms in Prometheus format
+
+Unknown mode or strategy values and bodies that are empty or not a
+decodable image are answered with 400; 500 means the OCR pipeline itself
+failed. Clients that take longer than OCR_SERVICE_READ_TIMEOUT seconds to
+send their request get 408.
+
+Requests are queued and picked up in batches by a bounded number of
+workers. When the queue is full the service answers 503 with Retry-After.
+
+With --workers N the engines are loaded once and N processes are forked
+from the loaded process. They share the model memory copy-on-write, accept
+connections on one listening socket, and share a node-local result cache.
+/health, /stats and /metrics report on the worker that served the request.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from utils import log_utils
+from utils.cache_utils import RESULT_CACHE, SHARED_CACHE_PATH
+from utils.image_utils import as_array, decode_upload
+from utils.metrics_utils import render_prometheus
+from utils.quality_utils import get_preprocess_memo_stats
+from utils.spell_utils import SPELL_INDEX_PATH, load_spell_index
+from utils.ocr_utils import (
+    OCR_MODES, OCR_STRATEGIES, extract_text, get_cascade_stats, get_engine_latencies,
+    get_engine_status, get_spell_memo_stats, init_ocr_engines, preload_engines
+)
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = int(os.environ.get('OCR_SERVICE_MAX_BODY', 25 * 1024 * 1024))
+
+# Seconds a client has to send the request head, and again the body
+READ_TIMEOUT = float(os.environ.get('OCR_SERVICE_READ_TIMEOUT', 30))
+
+# Processes serving requests; more than one forks them from a preloaded parent
+SERVICE_WORKERS = int(os.environ.get('OCR_SERVICE_WORKERS', 1))
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 408: 'Request Timeout',
+    413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'
+}
+
+def decode_image(data):
+    """
+    Decode uploaded bytes into an RGB numpy array, straight from the
+    request buffer when OpenCV supports the format. Raises ValueError when
+    the bytes are not an image.
+    """
+    if not data:
+        raise ValueError("empty image")
+    image = decode_upload(data)
+    if image is not None:
+        return image
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return as_array(img.convert('RGB'))
+    except Exception as e:
+        raise ValueError("not a supported image") from e
+
+def serialize_result(result):
+    """
+    Drop the parts of an extract_text result that do not belong in JSON
+    """
+    return {k: v for k, v in result.items() if not isinstance(v, np.ndarray)}
+
+def ocr_image(image, lang='eng', mode='Fast', strategy='concurrent'):
+    """
+    OCR one decoded image, raising RuntimeError if the pipeline failed
+    """
+    result = extract_text(image, lang=lang, mode=mode, strategy=strategy)
+    if result is None:
+        raise RuntimeError("OCR processing failed")
+    return serialize_result(result)
+
+def run_ocr(data, lang='eng', mode='Fast', strategy='concurrent'):
+    """
+    Decode and OCR one image, raising ValueError if the bytes are not an
+    image and RuntimeError if the pipeline failed
+    """
+    return ocr_image(decode_image(data), lang, mode, strategy)
+
+class OCRService:
+    """
+    Bounded queue of OCR jobs drained in batches by a fixed set of workers
+    """
+
+    def __init__(self, concurrency=2, batch_size=4, max_queue=64):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='ocr-service')
+        self.workers = []
+
+    def start(self):
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    def submit(self, image, lang, mode, strategy):
+        """
+        Queue a job and return its future, raises asyncio.QueueFull when saturated
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((image, lang, mode, strategy, future))
+        return future
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            outcomes = await loop.run_in_executor(self.executor, self._run_batch, batch)
+            for (*_, future), (ok, value) in zip(batch, outcomes):
+                if not future.cancelled():
+                    if ok:
+                        future.set_result(value)
+                    else:
+                        future.set_exception(RuntimeError(value))
+            for _ in batch:
+                self.queue.task_done()
+
+    @staticmethod
+    def _run_batch(batch):
+        outcomes = []
+        for image, lang, mode, strategy, _ in batch:
+            try:
+                outcomes.append((True, ocr_image(image, lang, mode, strategy)))
+            except Exception as e:
+                outcomes.append((False, str(e)))
+        return outcomes
+
+    async def handle(self, reader, writer):
+        """
+        Serve one HTTP/1.1 request per connection
+        """
+        try:
+            status, body, headers = await self._dispatch(reader)
+        except asyncio.TimeoutError:
+            status, body, headers = 408, {'error': f"request not received within {READ_TIMEOUT:g} s"}, {}
+        except Exception as e:
+            status, body, headers = 400, {'error': str(e)}, {}
+        if isinstance(body, str):
+            payload, content_type = body.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            payload, content_type = json.dumps(body).encode('utf-8'), 'application/json'
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(payload)}",
+                'Connection: close']
+        head += [f"{key}: {value}" for key, value in headers.items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_head(reader):
+        """
+        Request line and lower-cased headers
+        """
+        request_line = (await reader.readline()).decode('latin-1').strip()
+        method, target, _ = request_line.split(' ', 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        return method, target, headers
+
+    async def _dispatch(self, reader):
+        method, target, headers = await asyncio.wait_for(self._read_head(reader), READ_TIMEOUT)
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'engines': get_engine_status(), 'queued': self.queue.qsize(), 'pid': os.getpid()}, {}
+        if url.path == '/stats':
+            return 200, {
+                'cache': RESULT_CACHE.get_stats(),
+                'spell_memo': get_spell_memo_stats(),
+                'preprocess_memo': get_preprocess_memo_stats(),
+                'cascade': get_cascade_stats(),
+                'engine_latency': get_engine_latencies()
+            }, {}
+        if url.path == '/metrics':
+            return 200, render_prometheus(), {}
+        if url.path != '/ocr':
+            return 404, {'error': 'not found'}, {}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}, {}
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            return 413, {'error': f"body exceeds {MAX_BODY_BYTES} bytes"}, {}
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        mode = params.get('mode', 'Fast')
+        strategy = params.get('strategy', 'concurrent')
+        if mode not in OCR_MODES:
+            return 400, {'error': f"mode must be one of {', '.join(OCR_MODES)}"}, {}
+        if strategy not in OCR_STRATEGIES:
+            return 400, {'error': f"strategy must be one of {', '.join(OCR_STRATEGIES)}"}, {}
+        if length <= 0:
+            return 400, {'error': 'request body is empty, send the image bytes with a Content-Length'}, {}
+        data = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT)
+        # Undecodable bodies are the client's fault, answer 400 before queueing
+        try:
+            image = await asyncio.get_running_loop().run_in_executor(None, decode_image, data)
+        except ValueError as e:
+            return 400, {'error': f"body is {e}"}, {}
+        del data
+
+        try:
+            future = self.submit(image, params.get('lang', 'eng'), mode, strategy)
+        except asyncio.QueueFull:
+            return 503, {'error': 'OCR queue is full'}, {'Retry-After': '1'}
+        try:
+            return 200, await future, {}
+        except RuntimeError as e:
+            return 500, {'error': str(e)}, {}
+
+async def serve(host, port, concurrency, batch_size, max_queue, sock=None):
+    service = OCRService(concurrency=concurrency, batch_size=batch_size, max_queue=max_queue)
+    service.start()
+    if sock is not None:
+        server = await asyncio.start_server(service.handle, sock=sock)
+    else:
+        server = await asyncio.start_server(service.handle, host, port)
+    logging.getLogger('ocr').info("OCR service listening on %s:%s (pid %s)", host, port, os.getpid())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+def _run_worker(sock, host, port, concurrency, batch_size, max_queue):
+    """
+    Body of a forked worker process, never returns
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    code = 0
+    try:
+        asyncio.run(serve(host, port, concurrency, batch_size, max_queue, sock=sock))
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        log_utils.logger.exception("OCR worker %s failed", os.getpid())
+        code = 1
+    finally:
+        RESULT_CACHE.close()
+    os._exit(code)
+
+def serve_workers(host, port, workers, concurrency, batch_size, max_queue):
+    """
+    Pre-fork server: load the engines here, then fork workers that inherit
+    them and the listening socket. Workers that die are replaced until the
+    parent receives SIGTERM or SIGINT.
+    """
+    sock = socket.create_server((host, port), backlog=128)
+    preload_engines()
+
+    def fork_worker():
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(sock, host, port, concurrency, batch_size, max_queue)
+        return pid
+
+    children = {fork_worker() for _ in range(workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            log_utils.logger.warning("OCR worker %s exited with status %s, restarting", pid, status)
+            children.add(fork_worker())
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless OCR service")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help="Run the HTTP service")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--concurrency', type=int, default=2, help="Batches processed at once")
+    serve_parser.add_argument('--batch-size', type=int, default=4, help="Queued requests taken per batch")
+    serve_parser.add_argument('--max-queue', type=int, default=64, help="Queued requests before answering 503")
+    serve_parser.add_argument('--workers', type=int, default=SERVICE_WORKERS,
+                              help="Processes forked after loading the engines once")
+    serve_parser.add_argument('--cache-path', default=os.environ.get('OCR_CACHE_PATH') or None,
+                              help="sqlite result cache shared by the workers "
+                                   "(default with several workers: %s)" % SHARED_CACHE_PATH)
+
+    ocr_parser = subparsers.add_parser('ocr', help="OCR image files and print the text")
+    ocr_parser.add_argument('files', nargs='+')
+    ocr_parser.add_argument('--lang', default='eng')
+    ocr_parser.add_argument('--mode', choices=OCR_MODES, default='Fast')
+    ocr_parser.add_argument('--strategy', choices=OCR_STRATEGIES, default='concurrent')
+    ocr_parser.add_argument('--json', action='store_true', help="Print full results as JSON lines")
+
+    index_parser = subparsers.add_parser('spell-index', help="Build the spelling index ahead of the first request")
+    index_parser.add_argument('--output', default=SPELL_INDEX_PATH)
+    index_parser.add_argument('--words', nargs='*', default=None,
+                              help="Domain word lists (default: OCR_DOMAIN_WORDS)")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    # Outside Streamlit, pipeline warnings and errors go to the log
+    log_utils.set_message_handler(lambda level, message: log_utils.logger.log(level, message))
+
+    if args.command == 'serve':
+        if args.workers > 1 and not hasattr(os, 'fork'):
+            parser.error("--workers needs a platform with fork()")
+        cache_path = args.cache_path or (SHARED_CACHE_PATH if args.workers > 1 else None)
+        if cache_path != RESULT_CACHE.disk_path:
+            RESULT_CACHE.set_disk_path(cache_path)
+        if args.workers > 1:
+            log_utils.logger.info("Sharing OCR results between %s workers in %s", args.workers, cache_path)
+            serve_workers(args.host, args.port, args.workers, args.concurrency, args.batch_size, args.max_queue)
+            return
+        init_ocr_engines()
+        asyncio.run(serve(args.host, args.port, args.concurrency, args.batch_size, args.max_queue))
+        return
+    if args.command == 'spell-index':
+        index = load_spell_index(args.output, domain_files=args.words)
+        print(f"{len(index)} words in {args.output}")
+        return
+
+    failed = False
+    for path in args.files:
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            result = run_ocr(data, args.lang, args.mode, args.strategy)
+        except (ValueError, RuntimeError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        if args.json:
+            print(json.dumps(dict(result, file=path)))
+        else:
+            print(result['text'])
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
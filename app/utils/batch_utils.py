@@ -0,0 +1,257 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image, ImageSequence
+
+from utils.doc_utils import DocumentBuilder
+from utils.image_utils import as_array, decode_upload
+
+# Default number of OCR worker processes for batch jobs
+BATCH_WORKERS = int(os.environ.get('OCR_BATCH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+
+# Resolution PDF pages are rasterized at
+PDF_DPI = 300
+
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def _is_pdf(name):
+    return name.lower().endswith('.pdf')
+
+def count_pages(data, name):
+    """
+    Number of pages in an uploaded image, multi-page TIFF or PDF
+    """
+    if _is_pdf(name):
+        from pdf2image import pdfinfo_from_bytes
+        return int(pdfinfo_from_bytes(data)['Pages'])
+    with Image.open(io.BytesIO(data)) as img:
+        return getattr(img, 'n_frames', 1)
+
+def load_page(data, name, page_index):
+    """
+    Decode one page of an upload into an RGB numpy array
+    """
+    if _is_pdf(name):
+        from pdf2image import convert_from_bytes
+        page = convert_from_bytes(data, dpi=PDF_DPI, first_page=page_index + 1, last_page=page_index + 1)[0]
+        return as_array(page.convert('RGB'))
+    if page_index == 0:
+        # OpenCV decodes the first frame straight from the upload bytes
+        image = decode_upload(data)
+        if image is not None:
+            return image
+    with Image.open(io.BytesIO(data)) as img:
+        frame = ImageSequence.Iterator(img)[page_index]
+        return as_array(frame.convert('RGB'))
+
+def _pool_context():
+    """
+    Start method for batch workers. Forking the Streamlit server itself is
+    unsafe because it is multi-threaded, so where available workers are
+    forked from a single-threaded fork server that has loaded the engines
+    (utils.preload) and share its model memory. Elsewhere they are spawned
+    and each loads its own.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['utils.preload'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _warm_worker():
+    """
+    Load the OCR engines once when a worker process starts, a no-op when
+    they were inherited from the fork server
+    """
+    from utils.ocr_utils import init_ocr_engines
+    init_ocr_engines()
+
+def _ocr_page(data, name, page_index, lang, preprocessing_options, mode):
+    """
+    Worker entry point: decode a page and run OCR on it.
+    Pages are decoded in the worker so only the compressed upload crosses
+    the process boundary, and the processed image is not sent back.
+    """
+    from utils.ocr_utils import extract_text
+    result = extract_text(
+        load_page(data, name, page_index),
+        lang=lang,
+        preprocessing_options=preprocessing_options,
+        mode=mode
+    )
+    if result is None:
+        return None
+    result.pop('processed_image', None)
+    return result
+
+def get_batch_executor():
+    """
+    Shared process pool of OCR_BATCH_WORKERS workers that keep their OCR
+    engines warm between batches. It is never resized, jobs limit how many
+    of their own pages are in flight instead, so one session's settings
+    cannot cancel another session's pages.
+    """
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ProcessPoolExecutor(
+                max_workers=BATCH_WORKERS,
+                mp_context=_pool_context(),
+                initializer=_warm_worker
+            )
+        return _EXECUTOR
+
+class BatchJob:
+    """
+    OCR job over many uploaded files, one task per page on the shared
+    process pool with at most `workers` of its pages in flight. Results are
+    collected by poll() so a UI can render progress without blocking on
+    the whole batch, and each finished page is appended to the combined
+    Word document in upload order.
+    """
+
+    def __init__(self, files, lang='eng', preprocessing_options=None, mode='Fast', workers=None):
+        """
+        files is a list of (name, bytes) pairs
+        """
+        self.labels = []
+        self.errors = {}
+        self._tasks = []
+        for name, data in files:
+            try:
+                n_pages = count_pages(data, name)
+            except Exception as e:
+                self.errors[name] = str(e)
+                continue
+            for page_index in range(n_pages):
+                self.labels.append(name if n_pages == 1 else f"{name} (page {page_index + 1})")
+                self._tasks.append((data, name, page_index, lang, preprocessing_options, mode))
+        self.workers = max(1, workers or BATCH_WORKERS)
+        self.futures = [None] * len(self._tasks)
+        self.results = [None] * len(self._tasks)
+        self.builder = DocumentBuilder(title="Batch Scan")
+        self._appended = 0
+        self._document = None
+        self._submitted = 0
+        self._in_flight = 0
+        self._cancelled = False
+        # Reentrant, a future that is already done runs its callback at once
+        self._lock = threading.RLock()
+        self._submit()
+
+    @property
+    def total(self):
+        return len(self.futures)
+
+    def _submit(self):
+        """
+        Top up this job's pages on the pool to `workers` in flight
+        """
+        executor = get_batch_executor()
+        with self._lock:
+            while not self._cancelled and self._submitted < self.total and self._in_flight < self.workers:
+                i = self._submitted
+                self._submitted += 1
+                # Page bytes are only needed until the page is submitted
+                task, self._tasks[i] = self._tasks[i], None
+                try:
+                    future = executor.submit(_ocr_page, *task)
+                except Exception as e:
+                    future = Future()
+                    future.set_exception(e)
+                    self.futures[i] = future
+                    continue
+                self.futures[i] = future
+                self._in_flight += 1
+                future.add_done_callback(self._page_done)
+
+    def _page_done(self, future):
+        with self._lock:
+            self._in_flight -= 1
+        self._submit()
+
+    def _is_done(self, i):
+        future = self.futures[i]
+        if future is None:
+            return self._cancelled
+        return future.done()
+
+    def poll(self):
+        """
+        Collect finished pages, returns the number of pages done so far
+        """
+        done = 0
+        for i, future in enumerate(self.futures):
+            if not self._is_done(i):
+                continue
+            done += 1
+            if self.results[i] is None and self.labels[i] not in self.errors:
+                if future is None or future.cancelled():
+                    self.errors[self.labels[i]] = "Cancelled"
+                    continue
+                try:
+                    self.results[i] = future.result()
+                    if self.results[i] is None:
+                        self.errors[self.labels[i]] = "OCR failed"
+                except Exception as e:
+                    self.errors[self.labels[i]] = str(e) or type(e).__name__
+
+        # Append pages to the document as soon as all earlier pages are in
+        while self._appended < self.total and self._is_done(self._appended):
+            result = self.results[self._appended]
+            if result is not None:
+                self.builder.add_page(result['text'], heading=self.labels[self._appended])
+            self._appended += 1
+        return done
+
+    @property
+    def finished(self):
+        return all(self._is_done(i) for i in range(self.total))
+
+    def cancel(self):
+        """
+        Cancel pages that have not started yet, including the ones this
+        job has not submitted to the pool
+        """
+        with self._lock:
+            self._cancelled = True
+            futures = [future for future in self.futures if future is not None]
+        for future in futures:
+            future.cancel()
+
+    def document_file(self):
+        """
+        The combined document once the batch is finished, as a file object
+        positioned at the start, or None before that. It is serialized once
+        and kept in the spooled file (on disk when large) rather than as
+        bytes, so the job holds no in-memory copy of a big export.
+        """
+        if not self.finished or self._appended < self.total:
+            return None
+        if self._document is None:
+            self._document = self.builder.to_file()
+        self._document.seek(0)
+        return self._document
+
+    def close(self):
+        """
+        Cancel pending pages and delete the spooled document
+        """
+        self.cancel()
+        if self._document is not None:
+            self._document.close()
+            self._document = None
+
+    def combined_text(self):
+        """
+        Text of every finished page in upload order, headed by its label
+        """
+        sections = []
+        for label, result in zip(self.labels, self.results):
+            if result is not None:
+                sections.append(f"{label}\n\n{result['text']}")
+        return '\n\n'.join(sections)
@@ -0,0 +1,307 @@
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from utils import log_utils
+from utils.image_utils import as_array
+
+# Node-local sqlite file shared by worker processes when the service runs
+# with several workers and OCR_CACHE_PATH is not set
+SHARED_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'ocr', 'results.sqlite')
+
+# Seconds a worker waits for another process's write to the disk tier
+DISK_TIMEOUT = 5
+
+# Size bound of the disk tier; least recently used rows are deleted beyond it
+DISK_MAX_BYTES = int(os.environ.get('OCR_CACHE_DISK_MAX_BYTES', 1024 * 1024 * 1024))
+
+# Puts between two size checks of the disk tier, per process
+DISK_TRIM_INTERVAL = 64
+
+# Access times are rewritten on a hit only when older than this many
+# seconds, so most hits do not write to the shared file
+ACCESS_RESOLUTION = 60
+
+# Layout of the disk tier table; files with another layout are emptied
+_DISK_SCHEMA = 2
+
+def make_cache_key(image, preprocessing_options=None, lang='eng', mode='Fast', **settings):
+    """
+    Build a content address from the decoded pixels and the OCR settings.
+    settings holds anything else that changes the result, such as the
+    engine strategy and cascade thresholds.
+    """
+    pixels = np.ascontiguousarray(as_array(image))
+
+    digest = hashlib.sha256()
+    digest.update(f"{pixels.shape}|{pixels.dtype.str}".encode('utf-8'))
+    digest.update(memoryview(pixels).cast('B'))
+    digest.update(json.dumps(preprocessing_options or {}, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(f"|{lang}|{mode}".encode('utf-8'))
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+class OCRResultCache:
+    """
+    Two-tier cache for extract_text results.
+    The memory tier is an LRU bounded by the serialized size of its entries,
+    the optional disk tier is a sqlite file that survives restarts and is
+    shared by every process on the node that points at the same file.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, disk_path=None, disk_max_bytes=DISK_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+        self._generation = 0
+        self._disk_puts = 0
+        self.stats = {
+            'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0, 'disk_errors': 0
+        }
+        if disk_path:
+            self._init_disk()
+
+    def _disk_error(self, action, error):
+        """
+        Count and log a failed disk tier operation. The disk tier only saves
+        work, so its failures turn into misses or skipped writes instead of
+        failing the OCR request.
+        """
+        with self._lock:
+            self.stats['disk_errors'] += 1
+        log_utils.logger.warning(f"Result cache {action} failed on {self.disk_path}: {error}")
+
+    def _init_disk(self):
+        """
+        Create the sqlite table backing the disk tier
+        """
+        directory = os.path.dirname(self.disk_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            self._create_table()
+        except sqlite3.Error as e:
+            self._disk_error('setup', e)
+            return
+        self._trim_disk()
+
+    def _create_table(self):
+        conn = self._connect()
+        # Write-ahead logging lets workers read while another one writes;
+        # the mode is stored in the file, so every process picks it up
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Serialize the schema check between workers starting together
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute('PRAGMA user_version').fetchone()[0] != _DISK_SCHEMA:
+                # Cached results are disposable, a file of an older layout starts over
+                conn.execute('DROP TABLE IF EXISTS ocr_results')
+                conn.execute(
+                    'CREATE TABLE ocr_results (key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                    'size INTEGER NOT NULL, accessed REAL NOT NULL)'
+                )
+                conn.execute('CREATE INDEX ocr_results_accessed ON ocr_results (accessed)')
+                conn.execute(f'PRAGMA user_version = {_DISK_SCHEMA}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _connect(self):
+        """
+        This thread's connection to the disk tier, opened on first use.
+        Connections are never shared between threads or processes: a worker
+        forked from a process that had the file open opens its own.
+        """
+        owner = (os.getpid(), self._generation)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.owner == owner:
+            return conn
+        conn = sqlite3.connect(self.disk_path, timeout=DISK_TIMEOUT, check_same_thread=False)
+        # WAL stays consistent after a crash without syncing every commit
+        conn.execute('PRAGMA synchronous=NORMAL')
+        self._local.conn, self._local.owner = conn, owner
+        with self._lock:
+            self._connections.append((owner[0], conn))
+        return conn
+
+    def get(self, key):
+        """
+        Return the cached result for key, or None on a miss
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key][0]
+
+        if self.disk_path:
+            row = self._get_disk(key)
+            if row is not None:
+                result = json.loads(row[0])
+                with self._lock:
+                    self.stats['disk_hits'] += 1
+                self._put_memory(key, result, len(row[0]))
+                return result
+
+        with self._lock:
+            self.stats['misses'] += 1
+        return None
+
+    def _get_disk(self, key):
+        """
+        The (value, accessed) row stored on disk for key, refreshing a stale
+        access time. None on a miss or when the disk tier fails.
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute('SELECT value, accessed FROM ocr_results WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            self._disk_error('lookup', e)
+            return None
+        if row is not None:
+            now = time.time()
+            if now - row[1] > ACCESS_RESOLUTION:
+                try:
+                    with conn:
+                        conn.execute('UPDATE ocr_results SET accessed = ? WHERE key = ?', (now, key))
+                except sqlite3.Error:
+                    pass  # The access time only steers eviction
+        return row
+
+    def put(self, key, result):
+        """
+        Store a result in the memory tier and, if configured, on disk.
+        numpy arrays in the result stay in memory only and count
+        towards the size bound with their buffer size.
+        """
+        serializable = {k: v for k, v in result.items() if not isinstance(v, np.ndarray)}
+        array_bytes = sum(v.nbytes for v in result.values() if isinstance(v, np.ndarray))
+        payload = json.dumps(serializable, default=str)
+        self._put_memory(key, result, len(payload) + array_bytes)
+        if self.disk_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO ocr_results (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                        (key, payload, len(payload), time.time())
+                    )
+            except sqlite3.Error as e:
+                self._disk_error('write', e)
+                return
+            with self._lock:
+                self._disk_puts += 1
+                trim = self._disk_puts % DISK_TRIM_INTERVAL == 0
+            if trim:
+                self._trim_disk()
+
+    def _trim_disk(self):
+        """
+        Delete the least recently used rows of the disk tier until it is
+        back under 90% of disk_max_bytes
+        """
+        try:
+            conn = self._connect()
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM ocr_results').fetchone()[0]
+            if total <= self.disk_max_bytes:
+                return
+            excess = total - int(self.disk_max_bytes * 0.9)
+            keys, freed = [], 0
+            for key, size in conn.execute('SELECT key, size FROM ocr_results ORDER BY accessed'):
+                keys.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            with conn:
+                conn.executemany('DELETE FROM ocr_results WHERE key = ?', keys)
+        except sqlite3.Error as e:
+            self._disk_error('trim', e)
+            return
+        with self._lock:
+            self.stats['disk_evictions'] += len(keys)
+
+    def _put_memory(self, key, result, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """
+        Drop every entry from both tiers
+        """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+        if self.disk_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute('DELETE FROM ocr_results')
+            except sqlite3.Error as e:
+                self._disk_error('clear', e)
+
+    def set_disk_path(self, disk_path):
+        """
+        Move the disk tier to another sqlite file, or drop it with None
+        """
+        self.close()
+        self.disk_path = disk_path
+        if disk_path:
+            self._init_disk()
+
+    def close(self):
+        """
+        Close the disk tier connections this process opened. Threads open
+        a new one on their next lookup. Connections inherited from a parent
+        process are left alone, closing them could release its locks.
+        """
+        pid = os.getpid()
+        with self._lock:
+            self._generation += 1
+            closing = [conn for owner, conn in self._connections if owner == pid]
+            self._connections = [(owner, conn) for owner, conn in self._connections if owner != pid]
+        for conn in closing:
+            conn.close()
+
+    def get_stats(self):
+        """
+        Hit/miss/eviction counters plus current memory usage.
+        Counters are per process; the disk tier is shared.
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._size
+            stats['max_bytes'] = self.max_bytes
+            stats['disk_path'] = self.disk_path
+            stats['disk_max_bytes'] = self.disk_max_bytes
+            stats['pid'] = os.getpid()
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0
+        return stats
+
+# Process-wide result cache, sized and persisted through the environment
+RESULT_CACHE = OCRResultCache(
+    max_bytes=int(os.environ.get('OCR_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    disk_path=os.environ.get('OCR_CACHE_PATH') or None
+)
+atexit.register(RESULT_CACHE.close)
@@ -0,0 +1,286 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from utils import log_utils
+
+# Camera device index or video file the capture session reads from
+CAMERA_SOURCE = os.environ.get('OCR_CAMERA_SOURCE', '0')
+
+# Frames discarded after opening a camera while auto-exposure settles
+WARMUP_FRAMES = 5
+
+# Frames scored per capture; the sharpest one is kept
+CAPTURE_WINDOW = 8
+
+# Frames a camera driver may have buffered while the device sat open
+# (V4L2 keeps about 4). They were taken before the capture was requested,
+# so they are dropped before scoring.
+STALE_FRAMES = 4
+
+# Width frames are downsampled to before scoring
+SCORE_WIDTH = 320
+
+# Frames whose perceptual hashes differ in at most this many of 64 bits
+# count as unchanged
+HASH_DISTANCE = 6
+
+# Share of a frame that has to look like text for it to be preferred
+MIN_TEXT_COVERAGE = 0.02
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+def _small_gray(frame, width=SCORE_WIDTH):
+    """
+    Grayscale copy of a frame downsampled to width pixels
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+    factor = width / gray.shape[1]
+    if factor < 1.0:
+        gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    return gray
+
+def sharpness(gray):
+    """
+    Variance of the Laplacian, higher for sharper frames
+    """
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def text_coverage(gray):
+    """
+    Share of the frame covered by text-like blobs: dark strokes on a light
+    background (black-hat), binarized and closed along the lines
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 3))
+    strokes = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, kernel)
+    _, binary = cv2.threshold(strokes, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    lines = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (15, 3)))
+    return float(np.count_nonzero(lines)) / lines.size
+
+def dhash(gray, size=8):
+    """
+    64-bit difference hash: whether each pixel of a (size+1) x size
+    thumbnail is brighter than its right neighbour
+    """
+    thumbnail = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+def hash_distance(first, second):
+    """
+    Number of differing bits between two perceptual hashes
+    """
+    return bin(first ^ second).count('1')
+
+def score_frame(frame):
+    """
+    Sharpness, text coverage and perceptual hash of an RGB frame
+    """
+    gray = _small_gray(frame)
+    return {
+        'sharpness': sharpness(gray),
+        'text_coverage': text_coverage(gray),
+        'hash': dhash(gray)
+    }
+
+class _FrameIterator:
+    """
+    Adapter giving an iterable of RGB frames the VideoCapture read/release
+    interface, so synthetic frames can stand in for a camera
+    """
+
+    def __init__(self, frames):
+        self._frames = iter(frames)
+
+    def isOpened(self):
+        return self._frames is not None
+
+    def read(self):
+        try:
+            return True, next(self._frames)
+        except StopIteration:
+            return False, None
+
+    def grab(self):
+        return self.read()[0]
+
+    def release(self):
+        self._frames = None
+
+class CaptureSession:
+    """
+    Camera kept open between captures. Each capture scores a short window
+    of frames and keeps the sharpest one that shows text; recognize() skips
+    OCR when that frame is nearly identical to the last one recognized.
+    source is a camera index, a video file path or an iterable of RGB frames.
+    stale is the number of frames dropped before each capture, by default
+    STALE_FRAMES for cameras and none for files and iterables.
+    """
+
+    def __init__(self, source=0, window=CAPTURE_WINDOW, hash_threshold=HASH_DISTANCE, warmup=WARMUP_FRAMES,
+                 stale=None):
+        self.source = source
+        self.window = window
+        self.hash_threshold = hash_threshold
+        self.warmup = warmup
+        self.stale = stale
+        self._capture = None
+        self._lock = threading.Lock()
+        self._last_hash = None
+        self._last_kwargs = None
+        self._last_result = None
+        self._is_camera = False
+        self.stats = {
+            'frames': 0, 'stale_dropped': 0, 'captures': 0, 'ocr_runs': 0, 'ocr_skipped': 0, 'open_seconds': 0.0
+        }
+
+    def open(self):
+        """
+        Open the source if it is not open yet, returns whether it is usable
+        """
+        if self._capture is not None and self._capture.isOpened():
+            return True
+        start = time.perf_counter()
+        if isinstance(self.source, (int, str)):
+            source = int(self.source) if str(self.source).isdigit() else self.source
+            self._capture = cv2.VideoCapture(source)
+            is_camera = isinstance(source, int)
+        else:
+            self._capture = _FrameIterator(self.source)
+            is_camera = False
+        if not self._capture.isOpened():
+            self._capture = None
+            return False
+        self._is_camera = is_camera
+        if is_camera:
+            # Keep as few old frames queued as the backend allows
+            self._capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            # Let auto-exposure and focus settle before frames are used
+            for _ in range(self.warmup):
+                self._capture.read()
+        self.stats['open_seconds'] = time.perf_counter() - start
+        return True
+
+    def read(self):
+        """
+        Next frame as an RGB array, None when the source is exhausted
+        """
+        ret, frame = self._capture.read()
+        if not ret or frame is None:
+            return None
+        self.stats['frames'] += 1
+        if isinstance(self._capture, _FrameIterator):
+            return frame
+        # VideoCapture returns BGR, swap channels in place
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+
+    def capture(self):
+        """
+        Read up to window frames and return (frame, score) for the sharpest
+        one with text coverage above MIN_TEXT_COVERAGE, or the sharpest
+        overall if none has. Returns (None, None) if nothing could be read.
+        """
+        with self._lock:
+            if not self.open():
+                return None, None
+            self.flush()
+            best, best_score, best_key = None, None, None
+            for _ in range(self.window):
+                frame = self.read()
+                if frame is None:
+                    break
+                score = score_frame(frame)
+                key = (score['text_coverage'] >= MIN_TEXT_COVERAGE, score['sharpness'])
+                if best_key is None or key > best_key:
+                    best, best_score, best_key = frame, score, key
+            if best is not None:
+                self.stats['captures'] += 1
+            return best, best_score
+
+    def flush(self):
+        """
+        Drop frames buffered before this capture was requested. grab()
+        skips decoding, so this costs little more than the driver's wait.
+        """
+        stale = self.stale if self.stale is not None else (STALE_FRAMES if self._is_camera else 0)
+        for _ in range(stale):
+            if not self._capture.grab():
+                break
+            self.stats['stale_dropped'] += 1
+
+    def is_duplicate(self, score):
+        """
+        Whether a frame looks the same as the last one recognized
+        """
+        return self._last_hash is not None and hash_distance(score['hash'], self._last_hash) <= self.hash_threshold
+
+    def recognize(self, ocr=None, **extract_kwargs):
+        """
+        Capture the best frame and OCR it unless it matches the previous
+        recognized frame and settings, in which case the previous result
+        is reused.
+        Returns (frame, result, changed). ocr defaults to extract_text.
+        """
+        frame, score = self.capture()
+        if frame is None:
+            return None, None, False
+        if self.is_duplicate(score) and extract_kwargs == self._last_kwargs and self._last_result is not None:
+            self.stats['ocr_skipped'] += 1
+            return frame, self._last_result, False
+
+        if ocr is None:
+            from utils.ocr_utils import extract_text as ocr
+        result = ocr(frame, **extract_kwargs)
+        self.stats['ocr_runs'] += 1
+        if result is not None:
+            result = dict(result, frame_quality={k: v for k, v in score.items() if k != 'hash'})
+            self._last_hash = score['hash']
+            self._last_kwargs = extract_kwargs
+            self._last_result = result
+        return frame, result, True
+
+    def get_stats(self):
+        return dict(self.stats)
+
+    def close(self):
+        """
+        Release the camera or video file
+        """
+        with self._lock:
+            if self._capture is not None:
+                self._capture.release()
+                self._capture = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def get_capture_session(source=None):
+    """
+    The shared session for a camera or video source, created on first use.
+    A device can only be opened once, so every caller shares it.
+    """
+    source = CAMERA_SOURCE if source is None else source
+    with _SESSIONS_LOCK:
+        if source not in _SESSIONS:
+            _SESSIONS[source] = CaptureSession(source)
+        return _SESSIONS[source]
+
+def close_capture_sessions():
+    """
+    Release every shared capture session
+    """
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+    for session in sessions:
+        try:
+            session.close()
+        except Exception as e:
+            log_utils.logger.warning("Could not release capture source: %s", e)
@@ -1,37 +1,108 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
 import docx
+from docx.enum.text import WD_BREAK
 from docx.shared import Inches, Pt
-import streamlit as st
+from utils import log_utils
+from utils.metrics_utils import stage
+
+# Documents larger than this are spooled to a temporary file instead of RAM
+SPOOL_THRESHOLD = int(os.environ.get('OCR_DOCX_SPOOL_BYTES', 16 * 1024 * 1024))
+
+# Number of built documents kept by build_document_bytes
+DOCUMENT_MEMO_SIZE = 8
 
-def create_word_document(content, title="Scanned Document", font_name="Calibri", font_size=11):
+_DOCUMENT_MEMO = OrderedDict()
+_DOCUMENT_MEMO_LOCK = threading.Lock()
+
+class DocumentBuilder:
     """
-    Create a Word document from the given content
+    Word document assembled incrementally, page by page or paragraph by
+    paragraph, as OCR results arrive. Blank lines separate paragraphs and
+    single newlines become line breaks, so the text keeps its layout.
     """
-    try:
-        # Create document
-        doc = docx.Document()
-        
+
+    def __init__(self, title="Scanned Document", font_name="Calibri", font_size=11):
+        self.font_name = font_name
+        self.font_size = Pt(font_size)
+        self.pages = 0
+        self.doc = docx.Document()
+
         # Add title
-        doc.add_heading(title, 0)
-        
-        # Add content
-        paragraph = doc.add_paragraph(content)
-        
-        # Style the paragraph
-        for run in paragraph.runs:
-            run.font.name = font_name
-            run.font.size = Pt(font_size)
-        
+        self.doc.add_heading(title, 0)
+
         # Set margins (1 inch)
-        sections = doc.sections
-        for section in sections:
+        for section in self.doc.sections:
             section.top_margin = Inches(1)
             section.bottom_margin = Inches(1)
             section.left_margin = Inches(1)
             section.right_margin = Inches(1)
-        
-        return doc
+
+    def add_paragraph(self, text):
+        """
+        Add one paragraph, turning newlines into line breaks
+        """
+        paragraph = self.doc.add_paragraph()
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            run = paragraph.add_run(line)
+            run.font.name = self.font_name
+            run.font.size = self.font_size
+            if i < len(lines) - 1:
+                run.add_break(WD_BREAK.LINE)
+        return paragraph
+
+    def add_text(self, text):
+        """
+        Add text, one paragraph per blank-line separated block
+        """
+        for block in text.split('\n\n'):
+            if block.strip():
+                self.add_paragraph(block.strip('\n'))
+
+    def add_page(self, text, heading=None):
+        """
+        Add a page of text, starting a new Word page after the first one
+        """
+        if self.pages:
+            self.doc.add_page_break()
+        if heading:
+            self.doc.add_heading(heading, 1)
+        self.add_text(text)
+        self.pages += 1
+
+    def save(self, target):
+        """
+        Write the document to a path or binary file object
+        """
+        self.doc.save(target)
+
+    def to_file(self, spool_threshold=SPOOL_THRESHOLD):
+        """
+        Serialize into a file object positioned at the start. It stays in
+        memory up to spool_threshold bytes and rolls over to disk beyond that.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=spool_threshold)
+        self.doc.save(spool)
+        spool.seek(0)
+        return spool
+
+def create_word_document(content, title="Scanned Document", font_name="Calibri", font_size=11, timings=None):
+    """
+    Create a Word document from the given content.
+    Build time is recorded as the 'docx_build' stage (into timings if given).
+    """
+    try:
+        with stage(timings, 'docx_build'):
+            builder = DocumentBuilder(title, font_name, font_size)
+            builder.add_text(content)
+            return builder.doc
     except Exception as e:
-        st.error(f"Error creating Word document: {str(e)}")
+        log_utils.error(f"Error creating Word document: {str(e)}")
         return None
 
 def save_docx(doc, filename):
@@ -42,19 +113,46 @@ def save_docx(doc, filename):
         doc.save(filename)
         return True
     except Exception as e:
-        st.error(f"Error saving document: {str(e)}")
+        log_utils.error(f"Error saving document: {str(e)}")
         return False
 
-def get_document_bytes(doc):
+def get_document_bytes(doc, timings=None):
     """
-    Get document as bytes for download
+    Get document as bytes for download.
+    Serialization time is recorded as the 'docx_save' stage.
     """
     try:
         from io import BytesIO
         buffer = BytesIO()
-        doc.save(buffer)
+        with stage(timings, 'docx_save'):
+            doc.save(buffer)
         buffer.seek(0)
         return buffer
     except Exception as e:
-        st.error(f"Error converting document to bytes: {str(e)}")
+        log_utils.error(f"Error converting document to bytes: {str(e)}")
+        return None
+
+def build_document_bytes(content, title="Scanned Document", font_name="Calibri", font_size=11, timings=None):
+    """
+    Bytes of the Word document for content, memoized on the text hash,
+    title, font and size so Streamlit reruns do not rebuild it
+    """
+    key = (hashlib.sha256(content.encode('utf-8')).hexdigest(), title, font_name, font_size)
+    with _DOCUMENT_MEMO_LOCK:
+        if key in _DOCUMENT_MEMO:
+            _DOCUMENT_MEMO.move_to_end(key)
+            return _DOCUMENT_MEMO[key]
+
+    doc = create_word_document(content, title, font_name, font_size, timings=timings)
+    if doc is None:
+        return None
+    buffer = get_document_bytes(doc, timings=timings)
+    if buffer is None:
         return None
+    data = buffer.getvalue()
+
+    with _DOCUMENT_MEMO_LOCK:
+        _DOCUMENT_MEMO[key] = data
+        while len(_DOCUMENT_MEMO) > DOCUMENT_MEMO_SIZE:
+            _DOCUMENT_MEMO.popitem(last=False)
+    return data
@@ -0,0 +1,373 @@
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from utils.log_utils import logger
+
+# Time the scheduler waits for crops from other requests, 0 disables batching.
+# Off by default: the wait is added to every request, and the batcher calls
+# easyocr.recognition.get_text, which is not part of EasyOCR's public API.
+# Measure with benchmarks/bench_easyocr_batching.py before enabling it.
+BATCH_WINDOW_MS = float(os.environ.get('OCR_EASYOCR_BATCH_WINDOW_MS', 0))
+
+# Largest number of text crops recognized in one forward pass
+MAX_BATCH_SIZE = int(os.environ.get('OCR_EASYOCR_MAX_BATCH', 64))
+
+# Height EasyOCR's recognizer expects its crops at (easyocr.config.imgH);
+# not imported from easyocr so loading this module does not import torch
+RECOGNIZER_HEIGHT = 64
+
+def _env_flag(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Reader settings; changes apply to readers built afterwards
+EASYOCR_CONFIG = {
+    # Use CUDA only when asked for and available, CPU otherwise
+    'gpu': _env_flag('OCR_EASYOCR_GPU', False),
+    # torch intra-op threads per inference, None keeps torch's default (all cores)
+    'torch_threads': int(os.environ['OCR_TORCH_THREADS']) if os.environ.get('OCR_TORCH_THREADS') else None,
+    # Dynamic int8 quantization of the models on CPU
+    'quantize': _env_flag('OCR_EASYOCR_QUANTIZE', True),
+}
+
+# EasyOCR language codes for the Tesseract codes offered in the UI
+EASYOCR_LANGUAGES = {'eng': 'en', 'fra': 'fr', 'deu': 'de', 'spa': 'es', 'hin': 'hi'}
+
+# Memory the cached readers may use together before the least recently used is evicted
+READER_MEMORY_BUDGET_MB = int(os.environ.get('OCR_EASYOCR_MEMORY_MB', 1024))
+
+# Used when a reader's parameters cannot be measured
+DEFAULT_READER_SIZE = 200 * 1024 * 1024
+
+_BATCHERS = {}
+_BATCHERS_LOCK = threading.Lock()
+
+def configure_easyocr(**settings):
+    """
+    Update EASYOCR_CONFIG, e.g. configure_easyocr(torch_threads=2, quantize=False).
+    Readers that are already loaded keep their settings until rebuilt.
+    """
+    unknown = set(settings) - set(EASYOCR_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown EasyOCR settings: {', '.join(sorted(unknown))}")
+    EASYOCR_CONFIG.update(settings)
+
+def build_reader(lang_list=('en',), config=None):
+    """
+    Create an EasyOCR reader with the configured device, thread count and
+    quantization. Returns the reader; its device is available as reader.device.
+    """
+    import easyocr
+    import torch
+
+    config = dict(EASYOCR_CONFIG, **(config or {}))
+    if config['torch_threads']:
+        torch.set_num_threads(int(config['torch_threads']))
+    gpu = bool(config['gpu']) and torch.cuda.is_available()
+    if config['gpu'] and not gpu:
+        logger.warning("OCR_EASYOCR_GPU is set but CUDA is not available, EasyOCR runs on CPU")
+    return easyocr.Reader(list(lang_list), gpu=gpu, quantize=config['quantize'], verbose=False)
+
+def reader_languages(lang):
+    """
+    EasyOCR language list for a Tesseract language code.
+    English is always included since every other script model pairs with it.
+    """
+    code = EASYOCR_LANGUAGES.get(lang, 'en')
+    return ['en'] if code == 'en' else [code, 'en']
+
+def _tensor_bytes(value):
+    """
+    Bytes of the tensors in value: a tensor, a (nested) tuple or list of
+    them, or a packed-parameter object that hands them out through
+    __getstate__ like the weights of dynamically quantized Linear and LSTM
+    layers do
+    """
+    if hasattr(value, 'numel') and hasattr(value, 'element_size'):
+        return value.numel() * value.element_size()
+    if isinstance(value, (list, tuple)):
+        return sum(_tensor_bytes(item) for item in value)
+    if type(value).__name__ == 'ScriptObject':
+        try:
+            return _tensor_bytes(value.__getstate__())
+        except Exception:
+            return 0
+    return 0
+
+def estimate_reader_size(reader):
+    """
+    Bytes held by a reader's detector and recognizer: parameters, buffers
+    and the packed int8 weights of quantized layers, which parameters()
+    and buffers() do not return
+    """
+    size = 0
+    for model in (getattr(reader, 'detector', None), getattr(reader, 'recognizer', None)):
+        if model is None:
+            continue
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            size += tensor.numel() * tensor.element_size()
+        for module in model.modules():
+            # Packed weights are plain attributes, not parameters or submodules
+            for name in ('_packed_params', 'param'):
+                size += _tensor_bytes(vars(module).get(name))
+    return size or DEFAULT_READER_SIZE
+
+class ReaderCache:
+    """
+    One EasyOCR reader per language, loaded on demand and kept in LRU order.
+    When the readers together exceed budget_bytes the least recently used
+    ones are evicted. Load and evict events are logged and counted.
+    """
+
+    def __init__(self, budget_bytes=READER_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self._readers = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+        self.load_times = {}
+
+    def get(self, lang='eng'):
+        """
+        Reader for a Tesseract language code, loading it if needed
+        """
+        key = tuple(reader_languages(lang))
+        with self._lock:
+            if key in self._readers:
+                self._readers.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._readers[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if key in self._readers:
+                    self._readers.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return self._readers[key][0]
+
+            start = time.perf_counter()
+            reader = build_reader(list(key))
+            size = estimate_reader_size(reader)
+            self.load_times['+'.join(key)] = time.perf_counter() - start
+            logger.info("Loaded EasyOCR reader %s (%.0f MB) in %.1fs",
+                        '+'.join(key), size / 2**20, self.load_times['+'.join(key)])
+
+            with self._lock:
+                self._readers[key] = (reader, size)
+                self.stats['loads'] += 1
+                self._evict(keep=key)
+            return reader
+
+    def _evict(self, keep):
+        """
+        Drop least recently used readers until the budget is met,
+        never evicting the reader that was just requested
+        """
+        while self.memory_used() > self.budget_bytes and len(self._readers) > 1:
+            key = next(iter(self._readers))
+            if key == keep:
+                break
+            reader, size = self._readers.pop(key)
+            close_batcher(reader)
+            self.stats['evictions'] += 1
+            logger.info("Evicted EasyOCR reader %s (%.0f MB) to stay within %.0f MB",
+                        '+'.join(key), size / 2**20, self.budget_bytes / 2**20)
+
+    def memory_used(self):
+        return sum(size for _, size in self._readers.values())
+
+    def device(self):
+        """
+        Device of the most recently used reader ('cpu', 'cuda', ...),
+        None while no reader is loaded
+        """
+        with self._lock:
+            if not self._readers:
+                return None
+            reader = next(reversed(self._readers.values()))[0]
+        return str(getattr(reader, 'device', 'cpu'))
+
+    def get_stats(self):
+        """
+        Counters, loaded languages and memory use of the cache
+        """
+        with self._lock:
+            return dict(
+                self.stats,
+                loaded=['+'.join(key) for key in self._readers],
+                memory_mb=self.memory_used() / 2**20,
+                budget_mb=self.budget_bytes / 2**20,
+                load_times=dict(self.load_times)
+            )
+
+def describe_config(readers=None):
+    """
+    Short human readable summary of the EasyOCR settings, e.g. for the UI.
+    The device comes from a loaded reader in readers (a ReaderCache) when
+    there is one, since asking for the GPU falls back to CPU without CUDA.
+    """
+    device = readers.device() if readers is not None else None
+    if device is None:
+        on_gpu = False
+        parts = ['GPU requested' if EASYOCR_CONFIG['gpu'] else 'CPU mode']
+    else:
+        on_gpu = device.startswith('cuda')
+        parts = ['GPU mode' if on_gpu else 'CPU mode']
+    if EASYOCR_CONFIG['torch_threads']:
+        parts.append(f"{EASYOCR_CONFIG['torch_threads']} threads")
+    if EASYOCR_CONFIG['quantize'] and not on_gpu and not (device is None and EASYOCR_CONFIG['gpu']):
+        parts.append('int8')
+    return ', '.join(parts)
+
+def summarize(raw_result):
+    """
+    Turn per-crop (box, text, confidence) results into the engine detail
+    entry: paragraph-grouped text and the mean and lowest crop confidence
+    as percentages
+    """
+    if not raw_result:
+        return None
+    from easyocr.utils import get_paragraph
+    paragraphs = get_paragraph(raw_result, x_ths=1, y_ths=0.5)
+    confidences = [item[2] * 100 for item in raw_result]
+    return {
+        'text': ' '.join(paragraph[1] for paragraph in paragraphs),
+        'confidence': sum(confidences) / len(confidences),
+        'min_confidence': min(confidences)
+    }
+
+class RecognitionBatcher:
+    """
+    Collects detection crops from concurrent requests for up to window
+    seconds (or max_batch crops) and recognizes them in one forward pass
+    of the reader's recognizer, then hands each caller its own results.
+    """
+
+    def __init__(self, reader, window=BATCH_WINDOW_MS / 1000, max_batch=MAX_BATCH_SIZE):
+        self.reader = reader
+        self.window = window
+        self.max_batch = max_batch
+        self.ignore_char = ''.join(set(reader.character) - set(reader.lang_char))
+        self.stats = {'batches': 0, 'requests': 0, 'crops': 0}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name='easyocr-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, image_list, max_width):
+        """
+        Queue the crops of one image, returns a Future of their results
+        """
+        future = Future()
+        self._queue.put((image_list, max_width, future))
+        return future
+
+    def close(self):
+        """
+        Stop the scheduler thread once queued work is done
+        """
+        self._queue.put(None)
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            crops = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while crops < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Finish this batch, then stop
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                crops += len(item[0])
+            self._run(batch)
+
+    def _run(self, batch):
+        from easyocr.recognition import get_text
+
+        image_list = [crop for item in batch for crop in item[0]]
+        max_width = max(item[1] for item in batch)
+        try:
+            results = get_text(
+                self.reader.character, RECOGNIZER_HEIGHT, int(max_width),
+                self.reader.recognizer, self.reader.converter, image_list,
+                self.ignore_char, 'greedy', 5, len(image_list),
+                0.1, 0.5, 0.003, 0, self.reader.device
+            )
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['requests'] += len(batch)
+        self.stats['crops'] += len(image_list)
+        start = 0
+        for crops, _, future in batch:
+            future.set_result(results[start:start + len(crops)])
+            start += len(crops)
+
+    def get_stats(self):
+        """
+        Batch counters, including the average number of requests per batch
+        """
+        stats = dict(self.stats)
+        stats['requests_per_batch'] = stats['requests'] / stats['batches'] if stats['batches'] else 0
+        return stats
+
+def get_batcher(reader):
+    """
+    The shared batcher in front of a reader, created on first use
+    """
+    with _BATCHERS_LOCK:
+        if id(reader) not in _BATCHERS:
+            _BATCHERS[id(reader)] = RecognitionBatcher(reader)
+        return _BATCHERS[id(reader)]
+
+def close_batcher(reader):
+    """
+    Stop and forget the batcher of a reader that is being discarded
+    """
+    with _BATCHERS_LOCK:
+        batcher = _BATCHERS.pop(id(reader), None)
+    if batcher is not None:
+        batcher.close()
+
+def readtext_batched(reader, image):
+    """
+    Equivalent of reader.readtext(image, detail=1) with the recognition
+    step going through the shared micro-batcher
+    """
+    from easyocr.utils import get_image_list, reformat_input
+
+    img, img_cv_grey = reformat_input(image)
+    horizontal_list, free_list = reader.detect(img)
+    horizontal_list, free_list = horizontal_list[0], free_list[0]
+    if not horizontal_list and not free_list:
+        return []
+    image_list, max_width = get_image_list(horizontal_list, free_list, img_cv_grey, model_height=RECOGNIZER_HEIGHT)
+    return get_batcher(reader).submit(image_list, max_width).result()
+
+def run_easyocr(reader, image):
+    """
+    Run EasyOCR on an image and summarize the result, batching the
+    recognition step with other requests unless batching is disabled
+    """
+    if BATCH_WINDOW_MS > 0:
+        raw_result = readtext_batched(reader, image)
+    else:
+        raw_result = reader.readtext(image, detail=1)
+    return summarize(raw_result)
@@ -2,28 +2,138 @@ import cv2
 import numpy as np
 from PIL import Image
 
+from utils.metrics_utils import record_copy
+
 def load_image(image_file):
     """Load an image file and return as PIL Image"""
     img = Image.open(image_file)
     return img
 
-def get_image_details(img):
+def decode_upload(upload, grayscale=False):
+    """
+    Decode an uploaded file straight into one numpy buffer (RGB, or
+    single-channel when grayscale is set). upload can be a Streamlit
+    UploadedFile or anything exposing the buffer protocol; its bytes are
+    read through a memoryview, so the decoded pixels are the only copy.
+    Returns None when OpenCV cannot decode the data.
+    """
+    data = upload.getbuffer() if hasattr(upload, 'getbuffer') else upload
+    encoded = np.frombuffer(data, dtype=np.uint8)
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    image = cv2.imdecode(encoded, flags)
+    if image is None:
+        return None
+    if image.ndim == 3:
+        # OpenCV decodes to BGR, swap channels in place
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    record_copy('decode', image.nbytes)
+    return image
+
+def as_array(image):
+    """
+    Numpy view of an image. Arrays are returned as-is; PIL images have to
+    be copied, which is recorded.
+    """
+    if isinstance(image, Image.Image):
+        image = np.asarray(image)
+        record_copy('pil_to_array', image.nbytes)
+    return image
+
+def get_image_details(img, image_format=None):
     """Get basic details about the image"""
+    if isinstance(img, np.ndarray):
+        return {
+            'format': image_format,
+            'size': (img.shape[1], img.shape[0]),
+            'mode': 'L' if img.ndim == 2 else 'RGB'
+        }
     return {
         'format': img.format,
         'size': img.size,
         'mode': img.mode
     }
 
-def capture_photo():
-    """Capture photo from webcam"""
-    cap = cv2.VideoCapture(0)
-    ret, frame = cap.read()
-    cap.release()
+# Median glyph height in pixels where Tesseract and EasyOCR do best
+TARGET_TEXT_HEIGHT = 32
+
+# Upper bound on pixels handed to the OCR engines
+MAX_OCR_PIXELS = 12_000_000
+
+def estimate_text_height(image, sample_width=1000):
+    """
+    Estimate the median glyph height in pixels from connected components
+    of a downsampled, Otsu-binarized copy. Returns None when too few
+    glyph-like components are found.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    factor = min(1.0, sample_width / gray.shape[1])
+    if factor < 1.0:
+        gray = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+    
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    
+    # Drop specks, rules and picture regions
+    glyphs = (heights >= 3) & (heights < gray.shape[0] * 0.1) & (widths < heights * 5)
+    if glyphs.sum() < 10:
+        return None
+    return float(np.median(heights[glyphs])) / factor
+
+def normalize_resolution(image, target_height=TARGET_TEXT_HEIGHT, max_pixels=MAX_OCR_PIXELS,
+                         min_scale=0.25, max_scale=4.0, tolerance=0.2):
+    """
+    Rescale an image so its text sits near target_height pixels and the
+    page stays under max_pixels. Returns (image, scale) where scale maps
+    original coordinates to the returned image; scale is 1.0 when untouched.
+    """
+    height, width = image.shape[:2]
+    scale = 1.0
+    
+    text_height = estimate_text_height(image)
+    if text_height:
+        scale = min(max(target_height / text_height, min_scale), max_scale)
+        if abs(scale - 1.0) < tolerance:
+            scale = 1.0
+    
+    if height * width * scale * scale > max_pixels:
+        scale = (max_pixels / (height * width)) ** 0.5
+    
+    if scale == 1.0:
+        return image, scale
     
-    if ret:
-        # Convert BGR to RGB
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        # Convert to PIL Image
-        return Image.fromarray(frame)
-    return None
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+    resized = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+    return resized, scale
+
+def deskew(image, angle):
+    """
+    Rotate an image by angle degrees (counter-clockwise) about its centre,
+    filling the exposed corners with white
+    """
+    if abs(angle) < 0.05:
+        return image
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    border = 255 if image.ndim == 2 else (255,) * image.shape[2]
+    return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=border)
+
+def scale_box(box, scale):
+    """
+    Map a (left, top, width, height) box from a rescaled image back to
+    the original image coordinates
+    """
+    if scale == 1.0:
+        return box
+    return tuple(int(round(value / scale)) for value in box)
+
+def capture_photo():
+    """
+    Capture the sharpest of a few webcam frames as an RGB array.
+    The camera stays open in a shared session between calls.
+    """
+    from utils.capture_utils import get_capture_session
+    frame, _ = get_capture_session().capture()
+    return frame
@@ -0,0 +1,115 @@
+import cv2
+import numpy as np
+
+from utils.image_utils import TARGET_TEXT_HEIGHT, estimate_text_height
+
+# Width the layout is analysed at
+LAYOUT_WIDTH = 1000
+
+# Blocks denser than this are pictures or shading rather than text
+MAX_INK_DENSITY = 0.45
+
+# When the text blocks cover more of the page than this, cropping saves
+# nothing and the page is recognized whole
+MAX_BLOCK_COVERAGE = 0.85
+
+def _merge_overlapping(boxes):
+    """
+    Merge (left, top, width, height) boxes until none overlap
+    """
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]:
+                    left, top = min(a[0], b[0]), min(a[1], b[1])
+                    right, bottom = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+                    boxes[i] = (left, top, right - left, bottom - top)
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return boxes
+
+def detect_text_blocks(processed, padding=None):
+    """
+    Find text blocks on a binarized page (dark text on white, as returned
+    by preprocess_image). Works on a copy downsampled to LAYOUT_WIDTH:
+    glyphs are dilated into line and paragraph blobs, and blobs that are
+    too small or too dense to be text are dropped. Returns
+    (left, top, width, height) boxes in page coordinates, padded and in
+    reading order.
+    """
+    gray = cv2.cvtColor(processed, cv2.COLOR_RGB2GRAY) if processed.ndim == 3 else processed
+    height, width = gray.shape
+    factor = min(1.0, LAYOUT_WIDTH / width)
+    small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA) if factor < 1.0 else gray
+    ink = (small < 128).astype(np.uint8)
+
+    # Join letters into words and lines, and lines into paragraphs
+    text_height = (estimate_text_height(gray) or TARGET_TEXT_HEIGHT) * factor
+    kernel = cv2.getStructuringElement(
+        cv2.MORPH_RECT, (max(3, int(text_height * 1.5)), max(3, int(text_height * 0.8)))
+    )
+    blobs = cv2.dilate(ink, kernel)
+    contours, _ = cv2.findContours(blobs, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_area = max(4.0, text_height * text_height)
+    boxes = []
+    for contour in contours:
+        left, top, box_width, box_height = cv2.boundingRect(contour)
+        if box_width * box_height < min_area or box_height < text_height * 0.5:
+            continue
+        density = ink[top:top + box_height, left:left + box_width].mean()
+        if density > MAX_INK_DENSITY:
+            continue
+        boxes.append((left, top, box_width, box_height))
+
+    # Back to page coordinates with some margin around the glyphs
+    padding = int(text_height / factor * 0.5) if padding is None else padding
+    page_boxes = []
+    for left, top, box_width, box_height in boxes:
+        x0 = max(0, int(left / factor) - padding)
+        y0 = max(0, int(top / factor) - padding)
+        x1 = min(width, int((left + box_width) / factor) + padding)
+        y1 = min(height, int((top + box_height) / factor) + padding)
+        page_boxes.append((x0, y0, x1 - x0, y1 - y0))
+    return reading_order(_merge_overlapping(page_boxes))
+
+def block_coverage(boxes, shape):
+    """
+    Share of the page area covered by the boxes
+    """
+    return sum(box[2] * box[3] for box in boxes) / float(shape[0] * shape[1])
+
+def _split(boxes, axis):
+    """
+    Group boxes separated by a gap along axis (0 = x, 1 = y), in order
+    """
+    groups, end = [], None
+    for box in sorted(boxes, key=lambda box: box[axis]):
+        start, size = box[axis], box[axis + 2]
+        if end is None or start >= end:
+            groups.append([box])
+            end = start + size
+        else:
+            groups[-1].append(box)
+            end = max(end, start + size)
+    return groups
+
+def reading_order(boxes, axis=1):
+    """
+    Order blocks by recursive XY-cut: bands separated by horizontal gaps
+    are read top to bottom, columns within a band left to right
+    """
+    groups = _split(boxes, axis)
+    if len(groups) == 1:
+        groups = _split(boxes, 1 - axis)
+        if len(groups) == 1:
+            return sorted(boxes, key=lambda box: (box[1], box[0]))
+        return [box for group in groups for box in reading_order(group, axis)]
+    return [box for group in groups for box in reading_order(group, 1 - axis)]
@@ -0,0 +1,51 @@
+import logging
+
+logger = logging.getLogger('ocr')
+
+_HANDLER = None
+
+def _in_streamlit_script():
+    """
+    True when called from a Streamlit script thread
+    """
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+    except ImportError:
+        return False
+    return get_script_run_ctx(suppress_warning=True) is not None
+
+def _default_handler(level, message):
+    """
+    Show messages in the Streamlit page when running inside a script,
+    otherwise send them to the 'ocr' logger
+    """
+    if _in_streamlit_script():
+        import streamlit as st
+        if level >= logging.ERROR:
+            st.error(message)
+        elif level >= logging.WARNING:
+            st.warning(message)
+        else:
+            st.info(message)
+    else:
+        logger.log(level, message)
+
+def set_message_handler(handler):
+    """
+    Route user-facing messages from the utils to handler(level, message).
+    Pass None to restore the default Streamlit/logging behaviour.
+    """
+    global _HANDLER
+    _HANDLER = handler
+
+def report(level, message):
+    """
+    Deliver a message through the active handler
+    """
+    (_HANDLER or _default_handler)(level, message)
+
+def warning(message):
+    report(logging.WARNING, message)
+
+def error(message):
+    report(logging.ERROR, message)
@@ -0,0 +1,153 @@
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# JSON-lines file every instrumented request is appended to, if set
+METRICS_LOG = os.environ.get('OCR_METRICS_LOG') or None
+
+_HISTOGRAMS = {}
+_LOCK = threading.Lock()
+
+# Image buffer copies: process-wide totals and the tally of the current request
+_COPY_TOTALS = {}
+_REQUEST_COPIES = contextvars.ContextVar('ocr_request_copies', default=None)
+
+def peak_rss():
+    """
+    Peak resident set size of the process in bytes, None where unsupported
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def record_stage(name, seconds):
+    """
+    Add one observation to the stage's latency histogram
+    """
+    with _LOCK:
+        histogram = _HISTOGRAMS.setdefault(name, {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0})
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][i] += 1
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+
+@contextmanager
+def stage(timings, name, record=True):
+    """
+    Measure a pipeline stage: wall time, process CPU time and growth of the
+    peak RSS. The numbers go into timings[name] (skipped if timings is None)
+    and, unless record is False, into the stage's histogram.
+    """
+    rss_before = peak_rss()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        rss_after = peak_rss()
+        if timings is not None:
+            timings[name] = {
+                'wall_ms': wall * 1000,
+                'cpu_ms': (time.process_time() - cpu_start) * 1000,
+                'peak_rss_delta_mb': (rss_after - rss_before) / 2**20 if rss_after is not None else None
+            }
+        if record:
+            record_stage(name, wall)
+
+def record_copy(name, nbytes):
+    """
+    Count one full copy or re-encode of image data, in the process-wide
+    totals and in the tally of the request tracked by track_copies()
+    """
+    with _LOCK:
+        for tally in (_COPY_TOTALS, _REQUEST_COPIES.get()):
+            if tally is None:
+                continue
+            entry = tally.setdefault(name, {'count': 0, 'bytes': 0})
+            entry['count'] += 1
+            entry['bytes'] += int(nbytes)
+
+@contextmanager
+def track_copies():
+    """
+    Collect the copies made while the block runs into the yielded dict.
+    Nested blocks share the outer request's tally. Work handed to a thread
+    pool is only counted if it runs in a copy of this context.
+    """
+    copies = _REQUEST_COPIES.get()
+    if copies is not None:
+        yield copies
+        return
+    copies = {}
+    token = _REQUEST_COPIES.set(copies)
+    try:
+        yield copies
+    finally:
+        _REQUEST_COPIES.reset(token)
+
+def get_copy_stats():
+    """
+    Snapshot of the process-wide copy counters
+    """
+    with _LOCK:
+        return {name: dict(entry) for name, entry in _COPY_TOTALS.items()}
+
+def export_timings(timings, **fields):
+    """
+    Append one request's stage timings to METRICS_LOG as a JSON line
+    """
+    if not METRICS_LOG:
+        return
+    record = dict(fields, timestamp=time.time(), stages=timings)
+    with _LOCK:
+        with open(METRICS_LOG, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+
+def get_histograms():
+    """
+    Snapshot of the per-stage histograms
+    """
+    with _LOCK:
+        return {name: dict(h, buckets=list(h['buckets'])) for name, h in _HISTOGRAMS.items()}
+
+def render_prometheus():
+    """
+    Stage histograms in the Prometheus text exposition format
+    """
+    lines = [
+        '# HELP ocr_stage_seconds Wall time of OCR pipeline stages',
+        '# TYPE ocr_stage_seconds histogram'
+    ]
+    for name, histogram in sorted(get_histograms().items()):
+        for bound, count in zip(BUCKETS, histogram['buckets']):
+            lines.append(f'ocr_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+        lines.append(f'ocr_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'ocr_stage_seconds_sum{{stage="{name}"}} {histogram["sum"]}')
+        lines.append(f'ocr_stage_seconds_count{{stage="{name}"}} {histogram["count"]}')
+
+    copies = get_copy_stats()
+    lines.append('# HELP ocr_image_copies_total Full copies or re-encodes of image data')
+    lines.append('# TYPE ocr_image_copies_total counter')
+    for name, entry in sorted(copies.items()):
+        lines.append(f'ocr_image_copies_total{{source="{name}"}} {entry["count"]}')
+    lines.append('# HELP ocr_image_copy_bytes_total Bytes of image data copied')
+    lines.append('# TYPE ocr_image_copy_bytes_total counter')
+    for name, entry in sorted(copies.items()):
+        lines.append(f'ocr_image_copy_bytes_total{{source="{name}"}} {entry["bytes"]}')
+    return '\n'.join(lines) + '\n'
@@ -1,70 +1,290 @@
 import cv2
 import numpy as np
 import pytesseract
-import easyocr
 from PIL import Image
-import streamlit as st
+import gc
+import hashlib
+import json
 import os
-from spellchecker import SpellChecker
-import Levenshtein
-import torch
+import threading
+from collections import OrderedDict
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from importlib.metadata import PackageNotFoundError, version
+from utils import log_utils, tesseract_utils
+from utils.cache_utils import RESULT_CACHE, make_cache_key
+from utils.metrics_utils import stage, record_stage, export_timings, track_copies
+from utils.tesseract_utils import run_tesseract, get_tesseract_pool
+from utils.image_utils import as_array, deskew, normalize_resolution, scale_box
+from utils.quality_utils import choose_preprocessing
+from utils.layout_utils import MAX_BLOCK_COVERAGE, block_coverage, detect_text_blocks
+from utils.easyocr_utils import EASYOCR_CONFIG, run_easyocr, ReaderCache
+from utils.spell_utils import index_fingerprint, is_correctable
+
+# Engine names the lazy registry knows how to build
+ENGINE_NAMES = ('easyocr', 'tesseract', 'spellcheck')
+
+_ENGINES = {}
+_ENGINE_ERRORS = {}
+_ENGINE_LOAD_TIMES = {}
+_ENGINE_LOCKS = {name: threading.Lock() for name in ENGINE_NAMES}
+_ENGINE_LABELS = {'easyocr': 'EasyOCR', 'tesseract': 'Tesseract'}
+
+def _load_easyocr():
+    """
+    Build the per-language EasyOCR reader cache and load the English reader
+    (imports torch on first use)
+    """
+    readers = ReaderCache()
+    readers.get('eng')
+    return readers
+
+def _load_tesseract():
+    """
+    Locate the Tesseract binary or the in-process backend, loading one
+    instance per UI language into the warm pool.
+    Returns True when either is available.
+    """
+    pool = get_tesseract_pool()
+    if pool is not None:
+        failed = pool.warm()
+        if failed:
+            log_utils.logger.warning("Tesseract data not available for: %s", ', '.join(failed))
+    tesseract_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    if os.path.exists(tesseract_path):
+        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        return True
+    # The in-process backend does not need the binary
+    return True if pool is not None else None
+
+def _load_spellcheck():
+    """
+    Memory-map the OCR-aware spelling index, building it on first use
+    """
+    from utils.spell_utils import load_spell_index
+    return load_spell_index()
+
+_ENGINE_LOADERS = {
+    'easyocr': _load_easyocr,
+    'tesseract': _load_tesseract,
+    'spellcheck': _load_spellcheck,
+}
+
+def get_engine(name):
+    """
+    Return the named OCR engine, loading it on first use.
+    Loads are serialized per engine so concurrent sessions share one instance.
+    Returns None if the engine is unavailable or failed to load.
+    """
+    if name in _ENGINES:
+        return _ENGINES[name]
+    if name in _ENGINE_ERRORS:
+        return None
+    
+    with _ENGINE_LOCKS[name]:
+        # Another thread may have finished the load while we waited
+        if name in _ENGINES:
+            return _ENGINES[name]
+        if name in _ENGINE_ERRORS:
+            return None
+        
+        start = time.perf_counter()
+        try:
+            engine = _ENGINE_LOADERS[name]()
+        except Exception as e:
+            _ENGINE_ERRORS[name] = str(e)
+            engine = None
+        _ENGINE_LOAD_TIMES[name] = time.perf_counter() - start
+        if engine is not None:
+            _ENGINES[name] = engine
+        elif name not in _ENGINE_ERRORS:
+            _ENGINE_ERRORS[name] = f"{name} is not available"
+        return engine
+
+def reset_engine(name):
+    """
+    Forget a loaded or failed engine so the next get_engine() rebuilds it,
+    e.g. after changing its configuration
+    """
+    with _ENGINE_LOCKS[name]:
+        _ENGINES.pop(name, None)
+        _ENGINE_ERRORS.pop(name, None)
+        _ENGINE_LOAD_TIMES.pop(name, None)
+
+def loaded_engine(name):
+    """
+    The named engine if it has been loaded already, without loading it
+    """
+    return _ENGINES.get(name)
+
+def get_engine_load_times():
+    """
+    Seconds spent loading each engine that has been initialized so far
+    """
+    return dict(_ENGINE_LOAD_TIMES)
+
+def get_engine_status():
+    """
+    Summarize which engines are loaded, failed or not yet requested
+    """
+    status = {}
+    for name in ENGINE_NAMES:
+        if name in _ENGINES:
+            status[name] = 'loaded'
+        elif name in _ENGINE_ERRORS:
+            status[name] = f"unavailable: {_ENGINE_ERRORS[name]}"
+        else:
+            status[name] = 'not loaded'
+    return status
 
-# Initialize OCR engines
 def init_ocr_engines():
     """
-    Initialize both OCR engines and spell checker
+    Eagerly load all OCR engines and spell checker.
+    Kept for callers that want to pay the startup cost up front.
     """
     engines = {'status': True, 'error': None}
+    for name in ENGINE_NAMES:
+        engine = get_engine(name)
+        if engine is not None:
+            engines[name] = engine
     
-    try:
-        # Initialize EasyOCR
-        engines['easyocr'] = easyocr.Reader(['en'])
-        
-        # Initialize Tesseract
-        tesseract_path = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        if os.path.exists(tesseract_path):
-            pytesseract.pytesseract.tesseract_cmd = tesseract_path
-            engines['tesseract'] = True
-        
-        # Initialize spell checker
-        engines['spellcheck'] = SpellChecker()
-        
-        # Check for GPU
-        engines['gpu'] = torch.cuda.is_available()
-        
-    except Exception as e:
+    if get_engine('easyocr') is None and 'easyocr' in _ENGINE_ERRORS:
         engines['status'] = False
-        engines['error'] = str(e)
-    
+        engines['error'] = _ENGINE_ERRORS['easyocr']
+    engines['load_times'] = get_engine_load_times()
     return engines
 
-# Global OCR engines
-OCR_ENGINES = init_ocr_engines()
+def preload_engines():
+    """
+    Load every engine in a process that is about to fork workers, so the
+    workers share the model weights copy-on-write instead of loading their
+    own: the EasyOCR reader, the memory-mapped spelling index, and one warm
+    Tesseract instance per UI language in Fast mode. Further Tesseract
+    instances (a second one per language, Accurate mode) are created in
+    each worker on demand. Objects that survive loading are frozen out of
+    the garbage collector, whose bookkeeping would otherwise write to (and
+    so copy) the pages they live on in every worker.
+    """
+    engines = init_ocr_engines()
+    # sqlite connections must not cross a fork, workers open their own
+    RESULT_CACHE.close()
+    gc.collect()
+    gc.freeze()
+    return engines
+
+# Packages whose version can change OCR output
+_PIPELINE_PACKAGES = (
+    'easyocr', 'torch', 'tesserocr', 'pytesseract', 'opencv-python', 'opencv-python-headless', 'pyspellchecker'
+)
+_STATIC_FINGERPRINT = None
+
+def _static_fingerprint():
+    """
+    Hash of the pipeline source files, the engine package versions and the
+    spelling index sources, computed once per process
+    """
+    global _STATIC_FINGERPRINT
+    if _STATIC_FINGERPRINT is None:
+        digest = hashlib.sha256()
+        utils_dir = os.path.dirname(os.path.abspath(__file__))
+        for filename in sorted(os.listdir(utils_dir)):
+            if filename.endswith('.py'):
+                with open(os.path.join(utils_dir, filename), 'rb') as f:
+                    digest.update(filename.encode('utf-8') + f.read())
+        for package in _PIPELINE_PACKAGES:
+            try:
+                digest.update(f"|{package}={version(package)}".encode('utf-8'))
+            except PackageNotFoundError:
+                pass
+        try:
+            digest.update(index_fingerprint().encode('utf-8'))
+        except OSError:
+            pass  # A missing word list fails the spell checker load instead
+        _STATIC_FINGERPRINT = digest.hexdigest()
+    return _STATIC_FINGERPRINT
+
+def pipeline_fingerprint():
+    """
+    Identify what shapes a result besides the image and the request
+    settings: pipeline source, engine package versions, spelling index
+    sources and the current EasyOCR and Tesseract settings. It is part of
+    every result cache key, so the shared disk tier never serves results
+    of another version or configuration.
+    """
+    settings = json.dumps([EASYOCR_CONFIG, tesseract_utils.TESSERACT_BACKEND], sort_keys=True, default=str)
+    return hashlib.sha256((_static_fingerprint() + settings).encode('utf-8')).hexdigest()[:16]
+
+DEFAULT_PREPROCESSING_OPTIONS = {
+    'grayscale': True,
+    'denoise': True,
+    'contrast': False,
+    'contrast_level': 1.5,
+    'normalize': True,
+    'layout': True
+}
+
+# Named preprocessing chains, from cheapest to most thorough.
+# 'smoothing' runs before thresholding, 'denoise' after it when enabled.
+# The 'auto' profile picks one of them per image (see quality_utils).
+PREPROCESSING_PROFILES = {
+    'clean': {'smoothing': None, 'denoise': None},
+    'fast': {'smoothing': 'median', 'denoise': None},
+    'balanced': {'smoothing': 'gaussian', 'denoise': 'median'},
+    'quality': {'smoothing': 'bilateral', 'denoise': 'nlm'},
+}
+
+# Profile used by extract_text for each OCR mode when none is given
+PROFILE_BY_MODE = {'Fast': 'auto', 'Accurate': 'auto'}
+
+def _smooth(image, method):
+    """
+    Edge-preserving or cheap smoothing ahead of thresholding
+    """
+    if method == 'bilateral':
+        return cv2.bilateralFilter(image, 9, 75, 75)
+    if method == 'gaussian':
+        return cv2.GaussianBlur(image, (5, 5), 0)
+    if method == 'median':
+        return cv2.medianBlur(image, 3)
+    return image
+
+def _denoise(image, method):
+    """
+    Remove speckle noise left after thresholding
+    """
+    if method == 'nlm':
+        return cv2.fastNlMeansDenoising(image)
+    if method == 'median':
+        return cv2.medianBlur(image, 3)
+    return image
 
 def preprocess_image(image, options=None):
     """
-    Preprocess the image for better OCR results with advanced enhancements
+    Preprocess the image for better OCR results with advanced enhancements.
+    options['profile'] selects one of PREPROCESSING_PROFILES (default 'quality')
+    or 'auto' to let the quality analyzer choose; options['deskew'] rotates
+    the page by that many degrees before thresholding.
     """
     if options is None:
-        options = {
-            'grayscale': True,
-            'denoise': True,
-            'contrast': False,
-            'contrast_level': 1.5
-        }
+        options = DEFAULT_PREPROCESSING_OPTIONS
     
-    # Convert to numpy array if PIL Image
-    if isinstance(image, Image.Image):
-        image = np.array(image)
-    
-    # Make a copy to avoid modifying original
-    processed = image.copy()
+    # Every step below returns a new array, so the input is never modified
+    # and no defensive copy is needed
+    processed = np.asarray(image) if isinstance(image, Image.Image) else image
+    if options.get('profile') == 'auto':
+        options = dict(options, **choose_preprocessing(processed)['options'])
+    profile = PREPROCESSING_PROFILES[options.get('profile', 'quality')]
     
     # Convert to grayscale if needed
     if options.get('grayscale', True):
         if len(processed.shape) == 3:
             processed = cv2.cvtColor(processed, cv2.COLOR_RGB2GRAY)
     
+    # Straighten skewed scans and photos
+    if options.get('deskew'):
+        processed = deskew(processed, options['deskew'])
+    
     # Apply contrast enhancement using CLAHE
     if options.get('contrast', False):
         clahe = cv2.createCLAHE(
@@ -73,8 +293,8 @@ def preprocess_image(image, options=None):
         )
         processed = clahe.apply(processed)
     
-    # Apply bilateral filter for edge-preserving smoothing
-    processed = cv2.bilateralFilter(processed, 9, 75, 75)
+    # Smooth before thresholding
+    processed = _smooth(processed, profile['smoothing'])
     
     # Apply adaptive thresholding
     processed = cv2.adaptiveThreshold(
@@ -88,125 +308,565 @@ def preprocess_image(image, options=None):
     
     # Apply noise removal if needed
     if options.get('denoise', True):
-        processed = cv2.fastNlMeansDenoising(processed)
-    
-    # Dilate to connect text components
-    kernel = np.ones((1,1), np.uint8)
-    processed = cv2.dilate(processed, kernel, iterations=1)
+        processed = _denoise(processed, profile['denoise'])
     
     return processed
 
+def describe_chain(options):
+    """
+    The steps preprocess_image runs for fully resolved options, in order
+    """
+    profile = PREPROCESSING_PROFILES[options.get('profile', 'quality')]
+    steps = ['grayscale'] if options.get('grayscale', True) else []
+    if options.get('contrast', False):
+        steps.append(f"clahe({float(options.get('contrast_level', 1.5)):g})")
+    if options.get('deskew'):
+        steps.append(f"deskew({options['deskew']:+.1f})")
+    if profile['smoothing']:
+        steps.append(profile['smoothing'])
+    steps.append('adaptive_threshold')
+    if options.get('denoise', True) and profile['denoise']:
+        steps.append(profile['denoise'])
+    return steps
+
+def resolve_preprocessing_options(options=None, mode='Fast'):
+    """
+    Fill in defaults and the profile implied by the OCR mode
+    """
+    resolved = dict(DEFAULT_PREPROCESSING_OPTIONS, **(options or {}))
+    resolved.setdefault('profile', PROFILE_BY_MODE.get(mode, 'quality'))
+    return resolved
+
+# Bounded memo of word -> (correction, similarity) shared by every request
+SPELL_MEMO_SIZE = int(os.environ.get('OCR_SPELL_MEMO_SIZE', 50000))
+_SPELL_MEMO = OrderedDict()
+_SPELL_MEMO_LOCK = threading.Lock()
+_SPELL_MEMO_STATS = {'hits': 0, 'misses': 0}
+
+def _correct_word(word, spell_checker):
+    """
+    Best correction for an unknown word and its similarity to the original,
+    ranked by the index's OCR-weighted distance and then word frequency
+    """
+    return spell_checker.lookup(word)
+
+def _memoized_correction(word, spell_checker):
+    """
+    _correct_word behind the shared LRU memo
+    """
+    key = (id(spell_checker), word)
+    with _SPELL_MEMO_LOCK:
+        if key in _SPELL_MEMO:
+            _SPELL_MEMO.move_to_end(key)
+            _SPELL_MEMO_STATS['hits'] += 1
+            return _SPELL_MEMO[key]
+        _SPELL_MEMO_STATS['misses'] += 1
+    
+    correction = _correct_word(word, spell_checker)
+    with _SPELL_MEMO_LOCK:
+        _SPELL_MEMO[key] = correction
+        while len(_SPELL_MEMO) > SPELL_MEMO_SIZE:
+            _SPELL_MEMO.popitem(last=False)
+    return correction
+
+def get_spell_memo_stats():
+    """
+    Hit/miss counters and current size of the spell correction memo
+    """
+    with _SPELL_MEMO_LOCK:
+        stats = dict(_SPELL_MEMO_STATS, entries=len(_SPELL_MEMO), max_entries=SPELL_MEMO_SIZE)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+    return stats
+
 def validate_text(text, spell_checker):
     """
-    Validate and correct text using spell checking
-    """
-    words = text.split()
-    corrected_words = []
-    word_confidence = []
-    
-    for word in words:
-        if word.strip():
-            # Check if word is misspelled
-            if not spell_checker.known([word]):
-                # Get suggestions
-                candidates = spell_checker.candidates(word)
-                if candidates:
-                    # Find best match using Levenshtein distance
-                    best_match = min(candidates, key=lambda x: Levenshtein.distance(word, x))
-                    similarity = 1 - (Levenshtein.distance(word, best_match) / max(len(word), len(best_match)))
-                    corrected_words.append(best_match)
-                    word_confidence.append(similarity)
-                else:
-                    corrected_words.append(word)
-                    word_confidence.append(0.5)  # Medium confidence for unknown words
-            else:
-                corrected_words.append(word)
-                word_confidence.append(1.0)  # High confidence for known words
+    Validate and correct text using spell checking.
+    Unique tokens are checked with one bulk known() call and each unknown
+    token is corrected once through the shared memo, using the spelling
+    index's symmetric-delete lookup. Numbers and other tokens without
+    letters are kept unchanged with full confidence.
+    Line breaks are kept; spaces within a line are normalized.
+    """
+    lines = [line.split() for line in text.split('\n')]
+    words = [word for line in lines for word in line]
+    
+    # Numbers, amounts and dates are kept as they are
+    checked = {word for word in words if is_correctable(word)}
+    corrections = {word: (word, 1.0) for word in set(words) - checked}
+    
+    # Bulk dictionary lookup; known() returns lowercased words unless case sensitive
+    known = spell_checker.known(checked)
+    case_sensitive = getattr(spell_checker, '_case_sensitive', False)
+    
+    for word in checked:
+        if (word if case_sensitive else word.lower()) in known:
+            corrections[word] = (word, 1.0)  # High confidence for known words
+        else:
+            corrections[word] = _memoized_correction(word, spell_checker)
+    
+    word_confidence = [corrections[word][1] for word in words]
     
     return {
-        'text': ' '.join(corrected_words),
+        'text': '\n'.join(' '.join(corrections[word][0] for word in line) for line in lines),
         'word_confidence': word_confidence,
         'avg_confidence': sum(word_confidence) / len(word_confidence) if word_confidence else 0
     }
 
-def extract_text(image, lang='eng', preprocessing_options=None, mode='Fast'):
+# OCR modes and engine strategies extract_text accepts
+OCR_MODES = ('Fast', 'Accurate')
+OCR_STRATEGIES = ('sequential', 'concurrent', 'cascade')
+
+# Engine order used for sequential runs and for breaking confidence ties
+ENGINE_ORDER = ('easyocr', 'tesseract')
+
+# Seconds each engine may take in the concurrent strategy before it is abandoned
+DEFAULT_ENGINE_TIMEOUTS = {'easyocr': 60.0, 'tesseract': 30.0}
+
+# Bounded pool shared by every session for the concurrent strategy
+_ENGINE_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('OCR_ENGINE_THREADS', 4)),
+    thread_name_prefix='ocr-engine'
+)
+
+def _run_easyocr(processed_image, lang, mode):
     """
-    Extract text using hybrid OCR approach
+    Run EasyOCR on the preprocessed image, returns None if nothing was found
     """
-    try:
-        if not OCR_ENGINES['status']:
-            raise RuntimeError(f"OCR engines not properly initialized: {OCR_ENGINES['error']}")
-        
-        # Preprocess the image
-        processed_image = preprocess_image(image, preprocessing_options)
-        results = {'text': '', 'confidence': 0, 'details': {}}
-        
-        # EasyOCR processing
-        if 'easyocr' in OCR_ENGINES:
+    return run_easyocr(get_engine('easyocr').get(lang), processed_image)
+
+_ENGINE_RUNNERS = {
+    'easyocr': _run_easyocr,
+    'tesseract': run_tesseract,
+}
+
+# Prior latency estimates (seconds) used until an engine has been measured
+DEFAULT_ENGINE_LATENCY = {'tesseract': 1.0, 'easyocr': 3.0}
+
+# Confidence (0-100) the first engine of a cascade must reach to skip the rest
+DEFAULT_CASCADE_THRESHOLDS = {'mean': 85.0, 'min': 30.0}
+
+# Exponentially weighted moving average of each engine's run time
+_ENGINE_LATENCY = {}
+_LATENCY_ALPHA = 0.2
+_CASCADE_STATS = {'runs': 0, 'early_exits': 0}
+_CASCADE_LOCK = threading.Lock()
+
+def _record_engine_latency(name, seconds):
+    """
+    Fold one page's engine run time into the latency average
+    """
+    with _CASCADE_LOCK:
+        previous = _ENGINE_LATENCY.get(name)
+        _ENGINE_LATENCY[name] = seconds if previous is None else previous + _LATENCY_ALPHA * (seconds - previous)
+
+def _run_engine(name, processed_image, lang, mode, timings=None, record=True):
+    """
+    Run one engine as an instrumented stage and fold its run time
+    into the latency average. With record=False (block crops) the run
+    only goes into timings; the caller records the page total.
+    """
+    start = time.perf_counter()
+    with stage(timings, name, record=record):
+        detail = _ENGINE_RUNNERS[name](processed_image, lang, mode)
+    if record:
+        _record_engine_latency(name, time.perf_counter() - start)
+    return detail
+
+def get_engine_latencies():
+    """
+    Measured average run time per engine in seconds, priors where unmeasured
+    """
+    with _CASCADE_LOCK:
+        return dict(DEFAULT_ENGINE_LATENCY, **_ENGINE_LATENCY)
+
+def get_cascade_stats():
+    """
+    How many cascade runs stopped after the first engine
+    """
+    with _CASCADE_LOCK:
+        stats = dict(_CASCADE_STATS)
+    stats['early_exit_rate'] = stats['early_exits'] / stats['runs'] if stats['runs'] else 0
+    return stats
+
+def _available_engines():
+    """
+    Names of the OCR engines that loaded successfully, in ENGINE_ORDER
+    """
+    return [name for name in ENGINE_ORDER if get_engine(name)]
+
+def _run_engines_sequential(processed_image, lang, mode, timings=None, record=True):
+    """
+    Run each available engine one after the other
+    """
+    details, errors = {}, {}
+    for name in _available_engines():
+        try:
+            detail = _run_engine(name, processed_image, lang, mode, timings, record)
+            if detail is not None:
+                details[name] = detail
+        except Exception as e:
+            errors[name] = str(e)
+    return details, errors
+
+def _confident_enough(detail, thresholds):
+    """
+    True if an engine result clears both the mean and minimum word confidence
+    """
+    if detail is None:
+        return False
+    min_confidence = detail.get('min_confidence', detail['confidence'])
+    return detail['confidence'] >= thresholds['mean'] and min_confidence >= thresholds['min']
+
+def _count_cascade(early_exit):
+    with _CASCADE_LOCK:
+        _CASCADE_STATS['runs'] += 1
+        _CASCADE_STATS['early_exits'] += int(early_exit)
+
+def _run_engines_cascade(processed_image, lang, mode, thresholds=None, timings=None, record=True):
+    """
+    Run the engine with the lowest measured latency first and only run the
+    next one when the result falls below the confidence thresholds.
+    Returns details, errors and the cascade summary. With record=False
+    (block crops) neither latencies nor the cascade counters are updated.
+    """
+    thresholds = dict(DEFAULT_CASCADE_THRESHOLDS, **(thresholds or {}))
+    latencies = get_engine_latencies()
+    order = sorted(_available_engines(), key=lambda name: latencies.get(name, float('inf')))
+    
+    details, errors = {}, {}
+    ran = []
+    for name in order:
+        ran.append(name)
+        try:
+            detail = _run_engine(name, processed_image, lang, mode, timings, record)
+            if detail is not None:
+                details[name] = detail
+        except Exception as e:
+            errors[name] = str(e)
+            continue
+        if _confident_enough(detail, thresholds):
+            break
+    
+    early_exit = len(ran) < len(order)
+    if record:
+        _count_cascade(early_exit)
+    return details, errors, {'order': order, 'ran': ran, 'early_exit': early_exit}
+
+def _run_engines_concurrent(processed_image, lang, mode, timeouts=None, timings=None):
+    """
+    Run the available engines on the shared thread pool.
+    Engines that exceed their timeout are abandoned and reported in errors,
+    whatever finished in time is returned.
+    """
+    timeouts = dict(DEFAULT_ENGINE_TIMEOUTS, **(timeouts or {}))
+    start = time.monotonic()
+    futures = {
+        # Run in a copy of the caller's context so copies are tallied per request
+        name: _ENGINE_POOL.submit(
+            contextvars.copy_context().run, _run_engine, name, processed_image, lang, mode, timings
+        )
+        for name in _available_engines()
+    }
+    
+    details, errors = {}, {}
+    for name, future in futures.items():
+        remaining = start + timeouts.get(name, 60.0) - time.monotonic()
+        try:
+            detail = future.result(timeout=max(remaining, 0))
+            if detail is not None:
+                details[name] = detail
+        except FutureTimeoutError:
+            future.cancel()
+            errors[name] = f"timed out after {timeouts.get(name, 60.0):.0f}s"
+        except Exception as e:
+            errors[name] = str(e)
+    return details, errors
+
+def _run_engines_on_blocks(processed_image, boxes, lang, mode, strategy, timeouts=None, thresholds=None,
+                           timings=None):
+    """
+    Run the engines on the crop of each text block. The concurrent strategy
+    submits every (block, engine) pair to the shared pool at once, with each
+    engine's timeout covering all of its blocks; sequential and cascade go
+    block by block, the cascade deciding per block whether the next engine
+    is needed. Each engine's block runs are added up into one stage per
+    engine in timings, recorded once per page like an unsplit run, and a
+    cascade counts as one run that exited early if every block did.
+    Returns per-block details, errors and the cascade summary.
+    """
+    crops = [processed_image[top:top + height, left:left + width] for left, top, width, height in boxes]
+    block_details = [{} for _ in boxes]
+    block_timings = [{} for _ in boxes]
+    errors = {}
+    summary = None
+    
+    if strategy == 'concurrent':
+        timeouts = dict(DEFAULT_ENGINE_TIMEOUTS, **(timeouts or {}))
+        start = time.monotonic()
+        futures = {
+            (i, name): _ENGINE_POOL.submit(
+                contextvars.copy_context().run, _run_engine, name, crop, lang, mode, block_timings[i], False
+            )
+            for i, crop in enumerate(crops)
+            for name in _available_engines()
+        }
+        for (i, name), future in futures.items():
+            if name in errors:
+                future.cancel()
+                continue
+            remaining = start + timeouts.get(name, 60.0) - time.monotonic()
             try:
-                easy_result = OCR_ENGINES['easyocr'].readtext(
-                    processed_image,
-                    detail=1,
-                    paragraph=True
-                )
-                if easy_result:
-                    easy_text = ' '.join([text[1] for text in easy_result])
-                    easy_conf = sum([text[2] for text in easy_result]) / len(easy_result)
-                    results['details']['easyocr'] = {
-                        'text': easy_text,
-                        'confidence': easy_conf * 100
-                    }
+                detail = future.result(timeout=max(remaining, 0))
+                if detail is not None:
+                    block_details[i][name] = detail
+            except FutureTimeoutError:
+                future.cancel()
+                errors[name] = f"timed out after {timeouts.get(name, 60.0):.0f}s"
             except Exception as e:
-                st.warning(f"EasyOCR processing failed: {str(e)}")
-        
-        # Tesseract processing
-        if OCR_ENGINES.get('tesseract'):
-            try:
-                custom_config = f'-l {lang} --oem 1 --psm 6' if mode == 'Accurate' else f'-l {lang} --oem 3 --psm 6'
-                tess_text = pytesseract.image_to_string(processed_image, config=custom_config)
-                tess_data = pytesseract.image_to_data(processed_image, config=custom_config, output_type=pytesseract.Output.DICT)
-                confidences = [int(conf) for conf in tess_data['conf'] if conf != '-1']
-                tess_conf = sum(confidences) / len(confidences) if confidences else 0
-                results['details']['tesseract'] = {
-                    'text': tess_text.strip(),
-                    'confidence': tess_conf
+                errors[name] = str(e)
+    elif strategy == 'cascade':
+        summary = {'blocks': len(crops), 'early_exits': 0, 'ran': []}
+        for i, crop in enumerate(crops):
+            block_details[i], block_errors, block_summary = _run_engines_cascade(
+                crop, lang, mode, thresholds, block_timings[i], record=False
+            )
+            errors.update(block_errors)
+            summary['order'] = block_summary['order']
+            summary['early_exits'] += int(block_summary['early_exit'])
+            summary['ran'] += [name for name in block_summary['ran'] if name not in summary['ran']]
+        summary['early_exit'] = summary['early_exits'] == summary['blocks']
+        _count_cascade(summary['early_exit'])
+    else:
+        for i, crop in enumerate(crops):
+            block_details[i], block_errors = _run_engines_sequential(crop, lang, mode, block_timings[i], record=False)
+            errors.update(block_errors)
+    
+    _record_block_timings(block_timings, timings)
+    return block_details, errors, summary
+
+def _record_block_timings(block_timings, timings=None):
+    """
+    Add up each engine's per-block stages into one stage for the page,
+    written to timings and recorded in the histograms and latency averages
+    """
+    totals = {}
+    for entry in block_timings:
+        for name, measured in entry.items():
+            total = totals.setdefault(name, {'wall_ms': 0.0, 'cpu_ms': 0.0, 'peak_rss_delta_mb': None, 'blocks': 0})
+            total['wall_ms'] += measured['wall_ms']
+            total['cpu_ms'] += measured['cpu_ms']
+            if measured['peak_rss_delta_mb'] is not None:
+                total['peak_rss_delta_mb'] = max(total['peak_rss_delta_mb'] or 0.0, measured['peak_rss_delta_mb'])
+            total['blocks'] += 1
+    for name, total in totals.items():
+        record_stage(name, total['wall_ms'] / 1000)
+        _record_engine_latency(name, total['wall_ms'] / 1000)
+        if timings is not None:
+            timings[name] = total
+
+def _combine_blocks(block_details, boxes):
+    """
+    Merge per-block engine results in reading order.
+    Returns page-level details per engine (block texts joined by blank
+    lines, confidence weighted by text length, Tesseract word boxes moved
+    into page coordinates) and the block list with each block's best text.
+    """
+    blocks = []
+    for box, details in zip(boxes, block_details):
+        text, confidence = _select_best(details)
+        if text.strip():
+            blocks.append({'box': box, 'text': text, 'confidence': confidence})
+    
+    combined = {}
+    for name in ENGINE_ORDER:
+        parts = [(i, details[name]) for i, details in enumerate(block_details) if name in details]
+        if not parts:
+            continue
+        weights = [max(len(detail['text']), 1) for _, detail in parts]
+        combined[name] = {
+            'text': '\n\n'.join(detail['text'] for _, detail in parts if detail['text'].strip()),
+            'confidence': sum(w * detail['confidence'] for w, (_, detail) in zip(weights, parts)) / sum(weights),
+            'min_confidence': min(detail.get('min_confidence', detail['confidence']) for _, detail in parts)
+        }
+        if name == 'tesseract':
+            combined[name]['words'] = [
+                dict(word, box=(word['box'][0] + boxes[i][0], word['box'][1] + boxes[i][1]) + tuple(word['box'][2:]), region=i)
+                for i, detail in parts
+                for word in detail['words']
+            ]
+    return combined, blocks
+
+def _select_best(details):
+    """
+    Pick the engine result with the highest confidence.
+    Returns (text, confidence), preferring the later engine on ties.
+    """
+    best = None
+    for name in ENGINE_ORDER:
+        if name in details and (best is None or details[name]['confidence'] >= best['confidence']):
+            best = details[name]
+    if best is None:
+        return '', 0
+    return best['text'], best['confidence']
+
+def extract_text(image, lang='eng', preprocessing_options=None, mode='Fast', use_cache=True,
+                 strategy='sequential', timeouts=None, cascade_thresholds=None):
+    """
+    Extract text using hybrid OCR approach.
+    Results are cached on the image pixels, preprocessing options, lang and mode.
+    The preprocessing profile follows the mode unless the options name one,
+    and the image is rescaled to a good text height first (result['scale']).
+    The preprocessed array is returned as result['processed_image'] for display.
+    With the 'auto' profile (the default for both modes) the chain is chosen
+    per image from its contrast, noise and skew; result['preprocessing']
+    records the chain, the analysis and what both cost. Word and block boxes
+    of deskewed pages refer to the deskewed image.
+    Full copies of image data made along the way are counted in result['copies'].
+    Unless options['layout'] is False, text blocks are detected first and the
+    engines only see their crops; result['blocks'] lists each block's box and
+    best text in reading order.
+    strategy is 'sequential', 'concurrent' or 'cascade'. The concurrent strategy
+    runs the engines in parallel and honours per-engine timeouts (seconds by
+    engine name); the cascade runs the fastest engine first and stops when its
+    mean and minimum confidence clear cascade_thresholds.
+    """
+    with track_copies() as copies:
+        try:
+            timings = {}
+            request_start = time.perf_counter()
+            image = as_array(image)
+            preprocessing_options = resolve_preprocessing_options(preprocessing_options, mode)
+            cache_key = None
+            if use_cache:
+                with stage(timings, 'cache_lookup'):
+                    # Timeouts are left out: results with a timed-out engine are not cached
+                    cache_key = make_cache_key(
+                        image, preprocessing_options, lang, mode, strategy=strategy,
+                        cascade_thresholds=dict(DEFAULT_CASCADE_THRESHOLDS, **(cascade_thresholds or {}))
+                        if strategy == 'cascade' else None,
+                        pipeline=pipeline_fingerprint()
+                    )
+                    cached = RESULT_CACHE.get(cache_key)
+                if cached is not None:
+                    return dict(cached, cached=True, timings=timings, copies=copies)
+            
+            if not _available_engines():
+                raise RuntimeError(f"OCR engines not properly initialized: {_ENGINE_ERRORS.get('easyocr')}")
+            
+            # Bring the text to the size the engines work best at
+            scale = 1.0
+            if preprocessing_options.get('normalize', True):
+                with stage(timings, 'normalize'):
+                    image, scale = normalize_resolution(image)
+            
+            # Let the quality analyzer pick the chain for this image
+            analysis = None
+            if preprocessing_options.get('profile') == 'auto':
+                with stage(timings, 'analyze'):
+                    analysis = choose_preprocessing(image, mode)
+                preprocessing_options = dict(preprocessing_options, **analysis['options'])
+            
+            # Preprocess the image
+            with stage(timings, 'preprocess'):
+                processed_image = preprocess_image(image, preprocessing_options)
+            results = {
+                'text': '',
+                'confidence': 0,
+                'details': {},
+                'scale': scale,
+                'processed_image': processed_image,
+                'preprocessing': {
+                    'profile': preprocessing_options['profile'],
+                    'chain': describe_chain(preprocessing_options),
+                    'deskew': preprocessing_options.get('deskew', 0.0),
+                    'auto': analysis is not None,
+                    'memo_hit': analysis['memo_hit'] if analysis else None,
+                    'quality': analysis['quality'] if analysis else None,
+                    'analyze_ms': timings['analyze']['wall_ms'] if analysis else 0.0,
+                    'preprocess_ms': timings['preprocess']['wall_ms']
                 }
-            except Exception as e:
-                st.warning(f"Tesseract processing failed: {str(e)}")
-        
-        # Choose best result or combine results
-        if 'easyocr' in results['details'] and 'tesseract' in results['details']:
-            # Use result with higher confidence
-            easy_conf = results['details']['easyocr']['confidence']
-            tess_conf = results['details']['tesseract']['confidence']
+            }
+            if strategy not in OCR_STRATEGIES:
+                raise ValueError(f"Unknown OCR strategy: {strategy}")
+            
+            # Find the text blocks so margins, pictures and blank space are skipped
+            boxes = None
+            if preprocessing_options.get('layout', True):
+                with stage(timings, 'layout'):
+                    boxes = detect_text_blocks(processed_image)
+                if not boxes or block_coverage(boxes, processed_image.shape) > MAX_BLOCK_COVERAGE:
+                    boxes = None
             
-            if easy_conf > tess_conf:
-                results['text'] = results['details']['easyocr']['text']
-                results['confidence'] = easy_conf
+            blocks = None
+            if boxes is not None:
+                with stage(timings, 'blocks'):
+                    block_details, errors, summary = _run_engines_on_blocks(
+                        processed_image, boxes, lang, mode, strategy, timeouts, cascade_thresholds, timings
+                    )
+                details, blocks = _combine_blocks(block_details, boxes)
+                if summary is not None:
+                    results['cascade'] = summary
+            elif strategy == 'concurrent':
+                details, errors = _run_engines_concurrent(processed_image, lang, mode, timeouts, timings)
+            elif strategy == 'cascade':
+                details, errors, results['cascade'] = _run_engines_cascade(
+                    processed_image, lang, mode, cascade_thresholds, timings
+                )
             else:
-                results['text'] = results['details']['tesseract']['text']
-                results['confidence'] = tess_conf
-        elif 'easyocr' in results['details']:
-            results['text'] = results['details']['easyocr']['text']
-            results['confidence'] = results['details']['easyocr']['confidence']
-        elif 'tesseract' in results['details']:
-            results['text'] = results['details']['tesseract']['text']
-            results['confidence'] = results['details']['tesseract']['confidence']
-        
-        # Validate and correct text
-        if results['text'] and OCR_ENGINES.get('spellcheck'):
-            validated = validate_text(results['text'], OCR_ENGINES['spellcheck'])
-            results['text'] = validated['text']
-            results['word_confidence'] = validated['word_confidence']
-            results['confidence'] = (results['confidence'] + validated['avg_confidence'] * 100) / 2
-        
-        results['language'] = lang
-        results['word_count'] = len(results['text'].split())
-        
-        return results
-    except Exception as e:
-        st.error(f"Error in OCR processing: {str(e)}")
-        return None
+                details, errors = _run_engines_sequential(processed_image, lang, mode, timings)
+            
+            # Report word boxes in original image coordinates
+            if scale != 1.0 and 'tesseract' in details:
+                for word in details['tesseract']['words']:
+                    word['box'] = scale_box(word['box'], scale)
+            
+            for name, message in errors.items():
+                log_utils.warning(f"{_ENGINE_LABELS[name]} processing failed: {message}")
+            results['details'] = details
+            
+            # Choose best result, per block when the page was split
+            if blocks is not None:
+                for block in blocks:
+                    block['box'] = scale_box(block['box'], scale)
+                weights = [len(block['text']) for block in blocks]
+                results['blocks'] = blocks
+                results['text'] = '\n\n'.join(block['text'] for block in blocks)
+                results['confidence'] = (
+                    sum(w * block['confidence'] for w, block in zip(weights, blocks)) / sum(weights) if blocks else 0
+                )
+            else:
+                results['text'], results['confidence'] = _select_best(details)
+            if 'tesseract' in details:
+                results['words'] = details['tesseract']['words']
+            
+            # Validate and correct text
+            spell_checker = get_engine('spellcheck') if results['text'] else None
+            if spell_checker is not None:
+                with stage(timings, 'spellcheck'):
+                    validated = validate_text(results['text'], spell_checker)
+                results['text'] = validated['text']
+                results['word_confidence'] = validated['word_confidence']
+                results['confidence'] = (results['confidence'] + validated['avg_confidence'] * 100) / 2
+            
+            results['language'] = lang
+            results['word_count'] = len(results['text'].split())
+            
+            # Per-stage wall/CPU time and peak RSS growth for this request,
+            # and the image buffer copies it made
+            results['timings'] = timings
+            results['copies'] = copies
+            record_stage('total', time.perf_counter() - request_start)
+            export_timings(timings, language=lang, mode=mode, strategy=strategy, copies=copies)
+            
+            # Partial results from a failed or slow engine are not worth keeping
+            if cache_key is not None and not errors:
+                RESULT_CACHE.put(cache_key, results)
+            
+            return results
+        except Exception as e:
+            log_utils.error(f"Error in OCR processing: {str(e)}")
+            return None
 
 def save_text(text, filename):
     """
@@ -217,5 +877,5 @@ def save_text(text, filename):
             f.write(text)
         return True
     except Exception as e:
-        st.error(f"Error saving text: {str(e)}")
+        log_utils.error(f"Error saving text: {str(e)}")
         return False
@@ -0,0 +1,8 @@
+"""
+Imported by the batch pool's fork server before it forks any worker: the
+OCR engines are loaded once there and shared copy-on-write by every batch
+worker forked from it.
+"""
+from utils.ocr_utils import preload_engines
+
+preload_engines()
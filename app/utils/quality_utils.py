@@ -0,0 +1,184 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from utils.image_utils import estimate_text_height
+
+# Preprocessing profiles the analyzer chooses from, cheapest first
+AUTO_PROFILES = ('clean', 'fast', 'balanced', 'quality')
+
+# Noise (standard deviation on the 0-255 scale) above which the next,
+# more thorough profile is chosen
+NOISE_LEVELS = (1.5, 5.0, 12.0)
+
+# Contrast (gap between the mean ink and background levels, 0-1) below
+# which CLAHE is applied
+LOW_CONTRAST = 0.35
+AUTO_CONTRAST_LEVEL = 2.0
+
+# Skew in degrees worth correcting, and the largest angle searched
+MIN_SKEW = 0.5
+MAX_SKEW = 10.0
+
+# Number of preprocessing decisions remembered by image fingerprint
+PREPROCESS_MEMO_SIZE = int(os.environ.get('OCR_PREPROCESS_MEMO_SIZE', 256))
+
+_DECISIONS = OrderedDict()
+_DECISIONS_LOCK = threading.Lock()
+_DECISION_STATS = {'hits': 0, 'misses': 0}
+
+def _gray(image):
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+
+def _downsample(gray, width):
+    factor = width / gray.shape[1]
+    if factor >= 1.0:
+        return gray
+    return cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+
+def estimate_contrast(gray):
+    """
+    Gap between the mean levels of the ink and background classes split
+    by Otsu's threshold, 0 (flat) to 1. Global percentiles would miss the
+    ink, which covers only a few percent of a typical page.
+    """
+    threshold, _ = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    dark = gray <= threshold
+    n_dark = np.count_nonzero(dark)
+    if n_dark == 0 or n_dark == gray.size:
+        return 0.0
+    return float(gray[~dark].mean() - gray[dark].mean()) / 255
+
+def estimate_noise(gray, crop=512):
+    """
+    Standard deviation of Gaussian noise (Immerkaer's method) measured on a
+    full-resolution centre crop, since downsampling would average it away.
+    Glyph edges are masked out so sharp text does not read as noise.
+    """
+    height, width = gray.shape
+    top, left = max(0, (height - crop) // 2), max(0, (width - crop) // 2)
+    patch = gray[top:top + crop, left:left + crop]
+    if patch.shape[0] < 3 or patch.shape[1] < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = np.abs(cv2.filter2D(patch.astype(np.float32), -1, kernel))
+    edges = cv2.dilate(cv2.Canny(patch, 100, 200), np.ones((3, 3), np.uint8))
+    flat = response[edges == 0]
+    if flat.size == 0:
+        return 0.0
+    return float(np.sqrt(np.pi / 2) * flat.mean() / 6)
+
+def estimate_skew(gray, max_angle=MAX_SKEW, width=600):
+    """
+    Rotation in degrees that levels the text lines: the angle whose
+    horizontal ink profile is sharpest, searched in 1 degree steps and
+    refined in 0.2 degree steps. Returns 0.0 on pages without enough ink.
+    """
+    small = _downsample(gray, width)
+    _, ink = cv2.threshold(small, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    if np.count_nonzero(ink) < ink.size * 0.002:
+        return 0.0
+    height, width = ink.shape
+    center = (width / 2, height / 2)
+
+    def profile_variance(angle):
+        matrix = cv2.getRotationMatrix2D(center, angle, 1.0)
+        rotated = cv2.warpAffine(ink, matrix, (width, height), flags=cv2.INTER_NEAREST)
+        return float(np.var(rotated.sum(axis=1, dtype=np.float64)))
+
+    coarse = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=profile_variance)
+    fine = max(np.arange(coarse - 0.8, coarse + 0.9, 0.2), key=profile_variance)
+    return round(float(fine), 1)
+
+def analyze_quality(image):
+    """
+    Contrast, noise, skew and text height of an image
+    """
+    gray = _gray(image)
+    small = _downsample(gray, 800)
+    return {
+        'contrast': estimate_contrast(small),
+        'noise': estimate_noise(gray),
+        'skew': estimate_skew(gray),
+        'text_height': estimate_text_height(gray),
+        'width': gray.shape[1],
+        'height': gray.shape[0]
+    }
+
+def fingerprint(image):
+    """
+    Coarse key shared by scans from the same source: size in 128 px steps,
+    channel count, a quantized 8-bin histogram and a sharpness bucket of a
+    small thumbnail
+    """
+    gray = _gray(image)
+    thumbnail = _downsample(gray, 256)
+    histogram = cv2.calcHist([thumbnail], [0], None, [8], [0, 256]).ravel() / thumbnail.size
+    sharpness = float(np.abs(cv2.Laplacian(thumbnail, cv2.CV_32F)).mean())
+    return (
+        image.ndim,
+        gray.shape[1] // 128,
+        gray.shape[0] // 128,
+        tuple(int(round(share * 10)) for share in histogram),
+        int(np.log2(1 + sharpness))
+    )
+
+def decide_preprocessing(quality, mode='Fast'):
+    """
+    Cheapest chain likely to give good confidence for the measured quality.
+    Accurate mode goes one profile further than the noise alone calls for.
+    """
+    level = sum(quality['noise'] > threshold for threshold in NOISE_LEVELS)
+    if mode == 'Accurate':
+        level += 1
+    return {
+        'profile': AUTO_PROFILES[min(level, len(AUTO_PROFILES) - 1)],
+        'contrast': quality['contrast'] < LOW_CONTRAST,
+        'deskew': abs(quality['skew']) >= MIN_SKEW
+    }
+
+def choose_preprocessing(image, mode='Fast'):
+    """
+    Preprocessing decision for an image, memoized by fingerprint. On a memo
+    hit only the skew angle is measured, and only if the source needed
+    deskewing before. Returns the option overrides, the quality numbers
+    (None on a hit) and whether the memo was hit.
+    """
+    key = (fingerprint(image), mode)
+    with _DECISIONS_LOCK:
+        decision = _DECISIONS.get(key)
+        if decision is not None:
+            _DECISIONS.move_to_end(key)
+            _DECISION_STATS['hits'] += 1
+        else:
+            _DECISION_STATS['misses'] += 1
+
+    quality = None
+    if decision is None:
+        quality = analyze_quality(image)
+        decision = decide_preprocessing(quality, mode)
+        with _DECISIONS_LOCK:
+            _DECISIONS[key] = decision
+            while len(_DECISIONS) > PREPROCESS_MEMO_SIZE:
+                _DECISIONS.popitem(last=False)
+        angle = quality['skew']
+    else:
+        angle = estimate_skew(_gray(image)) if decision['deskew'] else 0.0
+
+    options = {'profile': decision['profile'], 'deskew': angle if abs(angle) >= MIN_SKEW else 0.0}
+    if decision['contrast']:
+        options.update(contrast=True, contrast_level=AUTO_CONTRAST_LEVEL)
+    return {'options': options, 'quality': quality, 'memo_hit': quality is None}
+
+def get_preprocess_memo_stats():
+    """
+    Hit/miss counters and current size of the preprocessing decision memo
+    """
+    with _DECISIONS_LOCK:
+        stats = dict(_DECISION_STATS, entries=len(_DECISIONS), max_entries=PREPROCESS_MEMO_SIZE)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+    return stats
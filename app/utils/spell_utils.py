@@ -0,0 +1,422 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+
+import Levenshtein
+from utils import log_utils
+
+# Largest edit distance the index answers for, and the word prefix the
+# deletes are generated from (longer words are verified on the full word)
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+# Words up to this length are only corrected at distance 1
+SHORT_WORD_LENGTH = 4
+
+# Where the index is stored and which domain word lists go into it
+SPELL_INDEX_PATH = os.environ.get('OCR_SPELL_INDEX') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'ocr', 'spell_index.bin'
+)
+DOMAIN_WORD_FILES = [path for path in os.environ.get('OCR_DOMAIN_WORDS', '').split(os.pathsep) if path]
+
+# Character pairs OCR engines confuse, and what swapping them costs
+# instead of a full edit
+CONFUSION_COST = 0.25
+OCR_CONFUSIONS = (
+    ('0', 'o'), ('1', 'l'), ('1', 'i'), ('l', 'i'), ('5', 's'),
+    ('8', 'b'), ('6', 'b'), ('2', 'z'), ('9', 'g'), ('c', 'e'), ('u', 'v')
+)
+
+# Glyphs that get split or merged, e.g. 'rn' read for 'm'
+SPLIT_COST = 0.4
+OCR_SPLITS = (('rn', 'm'), ('cl', 'd'), ('vv', 'w'), ('li', 'h'))
+
+_SUBSTITUTION_COSTS = {}
+for _a, _b in OCR_CONFUSIONS:
+    _SUBSTITUTION_COSTS[(_a, _b)] = _SUBSTITUTION_COSTS[(_b, _a)] = CONFUSION_COST
+
+# Split rules in both directions, grouped by the last character of the source side
+_SPLIT_RULES = {}
+for _a, _b in OCR_SPLITS:
+    _SPLIT_RULES.setdefault(_a[-1], []).append((_a, _b))
+    _SPLIT_RULES.setdefault(_b[-1], []).append((_b, _a))
+
+# Spelling each confusion collapses to, used to find and prefilter candidates
+_CANONICAL = str.maketrans({'0': 'o', '1': 'l', '5': 's', '8': 'b', '6': 'b', '2': 'z', '9': 'g'})
+
+_MAGIC = b'OCRSPELL'
+_FORMAT_VERSION = 1
+
+def canonical(word):
+    """
+    Collapse common OCR confusions so 'rnodel' and 'm0del' both read 'model'
+    """
+    word = word.translate(_CANONICAL)
+    for source, target in OCR_SPLITS:
+        word = word.replace(source, target)
+    return word
+
+def is_correctable(word):
+    """
+    Whether a token should be spell checked at all. Numbers, amounts, dates
+    and other tokens without letters are left alone, since OCR confusions
+    such as 0/o and 5/s would otherwise turn '50' into 'so'.
+    """
+    if not any(char.isalpha() for char in word):
+        return False
+    try:
+        float(word)
+    except ValueError:
+        return True
+    return False
+
+def ocr_distance(source, target):
+    """
+    Weighted Damerau-Levenshtein distance where OCR confusions (OCR_CONFUSIONS,
+    OCR_SPLITS) are cheaper than ordinary edits
+    """
+    rows = [[float(j) for j in range(len(target) + 1)]]
+    for i in range(1, len(source) + 1):
+        row = [float(i)] + [0.0] * len(target)
+        a = source[i - 1]
+        for j in range(1, len(target) + 1):
+            b = target[j - 1]
+            substitution = 0.0 if a == b else _SUBSTITUTION_COSTS.get((a, b), 1.0)
+            best = min(rows[i - 1][j] + 1, row[j - 1] + 1, rows[i - 1][j - 1] + substitution)
+            if i > 1 and j > 1 and a == target[j - 2] and source[i - 2] == b:
+                best = min(best, rows[i - 2][j - 2] + 1)
+            for part, replacement in _SPLIT_RULES.get(a, ()):
+                if source.endswith(part, 0, i) and target.endswith(replacement, 0, j):
+                    best = min(best, rows[i - len(part)][j - len(replacement)] + SPLIT_COST)
+            row[j] = best
+        rows.append(row)
+    return rows[-1][-1]
+
+def _hash(text):
+    """
+    Stable 64-bit hash of a string, the same in every process
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def _deletes(word, max_distance):
+    """
+    The word and every string made by deleting up to max_distance characters
+    """
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            candidate[:i] + candidate[i + 1:]
+            for candidate in frontier if len(candidate) > 1
+            for i in range(len(candidate))
+        }
+        results |= frontier
+    return results
+
+def _match_case(original, correction):
+    """
+    Give a correction the capitalization of the token it replaces
+    """
+    if original.isupper() and len(original) > 1:
+        return correction.upper()
+    if original[:1].isupper():
+        return correction[:1].upper() + correction[1:]
+    return correction
+
+class SpellIndex:
+    """
+    Symmetric-delete (SymSpell-style) spelling index.
+    Every dictionary word is stored under all deletes of its prefix, so a
+    lookup only hashes the deletes of the query instead of generating every
+    edit. Sections are flat arrays that can be memory-mapped straight from
+    the index file; an in-memory index built from scratch has the same layout.
+    """
+
+    _SECTIONS = (
+        ('word_offsets', 'I'), ('counts', 'I'), ('word_keys', 'Q'), ('word_ids', 'I'),
+        ('keys', 'Q'), ('starts', 'I'), ('postings', 'I'), ('words', 'B')
+    )
+
+    def __init__(self, sections, meta, buffer=None):
+        self.meta = meta
+        self.max_distance = meta['max_distance']
+        self.prefix_length = meta['prefix_length']
+        self.fingerprint = meta.get('fingerprint')
+        self._buffer = buffer
+        for name, _ in self._SECTIONS:
+            setattr(self, '_' + name, sections[name])
+
+    @classmethod
+    def build(cls, frequencies, max_distance=MAX_EDIT_DISTANCE, prefix_length=PREFIX_LENGTH, fingerprint=None):
+        """
+        Build an index from a {word: count} mapping
+        """
+        words = sorted(word for word in frequencies if word)
+        word_offsets = array('I', [0])
+        blob = bytearray()
+        counts = array('I')
+        entries = []
+        for i, word in enumerate(words):
+            blob += word.encode('utf-8')
+            word_offsets.append(len(blob))
+            counts.append(min(int(frequencies[word]), 2**32 - 1))
+            for delete in _deletes(word[:prefix_length], max_distance):
+                entries.append(_hash(delete) << 32 | i)
+
+        # Deletes sorted by hash, each key pointing at its run of word ids
+        entries.sort()
+        keys, starts, postings = array('Q'), array('I'), array('I')
+        for entry in entries:
+            key = entry >> 32
+            if not keys or keys[-1] != key:
+                keys.append(key)
+                starts.append(len(postings))
+            postings.append(entry & 0xFFFFFFFF)
+        starts.append(len(postings))
+
+        word_entries = sorted((_hash(word), i) for i, word in enumerate(words))
+        sections = {
+            'word_offsets': word_offsets,
+            'counts': counts,
+            'word_keys': array('Q', (key for key, _ in word_entries)),
+            'word_ids': array('I', (i for _, i in word_entries)),
+            'keys': keys,
+            'starts': starts,
+            'postings': postings,
+            'words': array('B', blob)
+        }
+        meta = {
+            'version': _FORMAT_VERSION,
+            'byteorder': sys.byteorder,
+            'max_distance': max_distance,
+            'prefix_length': prefix_length,
+            'fingerprint': fingerprint,
+            'word_count': len(words)
+        }
+        return cls(sections, meta)
+
+    def save(self, path):
+        """
+        Write the index to path atomically, sections aligned to 8 bytes
+        """
+        offsets, position = {}, 0
+        for name, typecode in self._SECTIONS:
+            section = getattr(self, '_' + name)
+            offsets[name] = [position, typecode, len(section)]
+            position += -(-len(section) * array(typecode).itemsize // 8) * 8
+        header = json.dumps(dict(self.meta, sections=offsets)).encode('utf-8')
+        data_start = -(-(len(_MAGIC) + 4 + len(header)) // 8) * 8
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(_MAGIC + len(header).to_bytes(4, 'little') + header)
+            for name, _ in self._SECTIONS:
+                f.seek(data_start + offsets[name][0])
+                f.write(memoryview(getattr(self, '_' + name)).cast('B'))
+            f.truncate(data_start + position)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map an index file. The sections are views into the mapping,
+        so loading reads only the header and processes share the pages.
+        """
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_end = len(_MAGIC) + 4 + int.from_bytes(buffer[len(_MAGIC):len(_MAGIC) + 4], 'little')
+        meta = None
+        if buffer[:len(_MAGIC)] == _MAGIC:
+            try:
+                meta = json.loads(buffer[len(_MAGIC) + 4:header_end])
+            except ValueError:
+                pass
+        if meta is None or meta.get('version') != _FORMAT_VERSION or meta.get('byteorder') != sys.byteorder:
+            buffer.close()
+            raise ValueError(f"{path} is not a spelling index for this version")
+
+        view = memoryview(buffer)
+
+        data_start = -(-header_end // 8) * 8
+        sections = {}
+        for name, (offset, typecode, length) in meta.pop('sections').items():
+            start = data_start + offset
+            sections[name] = view[start:start + length * array(typecode).itemsize].cast(typecode)
+        return cls(sections, meta, buffer)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def word(self, word_id):
+        return bytes(self._words[self._word_offsets[word_id]:self._word_offsets[word_id + 1]]).decode('utf-8')
+
+    def _find_word(self, word):
+        """
+        Id of a dictionary word, or None
+        """
+        key = _hash(word)
+        position = bisect_left(self._word_keys, key)
+        while position < len(self._word_keys) and self._word_keys[position] == key:
+            word_id = self._word_ids[position]
+            if self.word(word_id) == word:
+                return word_id
+            position += 1
+        return None
+
+    def known(self, words):
+        """
+        The lowercased forms of words that are in the dictionary
+        """
+        return {word.lower() for word in words if self._find_word(word.lower()) is not None}
+
+    def _candidate_ids(self, word, max_distance):
+        """
+        Ids of the words sharing at least one prefix delete with word
+        """
+        ids = set()
+        for delete in _deletes(word[:self.prefix_length], max_distance):
+            key = _hash(delete)
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                ids.update(self._postings[self._starts[position]:self._starts[position + 1]])
+        return ids
+
+    def candidates(self, word, max_distance=None):
+        """
+        Dictionary words within max_distance of word under ocr_distance,
+        as (distance, -count, candidate) tuples sorted best first
+        """
+        word = word.lower()
+        if max_distance is None:
+            max_distance = self.max_distance if len(word) > SHORT_WORD_LENGTH else 1
+        max_distance = min(max_distance, self.max_distance)
+
+        # Searching the canonical spelling too finds words hidden behind
+        # several OCR confusions that a plain edit distance would exceed
+        ids = self._candidate_ids(word, max_distance)
+        canonical_word = canonical(word)
+        if canonical_word != word:
+            ids |= self._candidate_ids(canonical_word, max_distance)
+
+        results = []
+        for word_id in ids:
+            candidate = self.word(word_id)
+            # Every character of length difference costs at least a split
+            if abs(len(candidate) - len(word)) * SPLIT_COST > max_distance:
+                continue
+            # Cheap C-level prefilter: confusions make the raw distance too
+            # high and canonical folding can make the folded one too high,
+            # so only reject when both spellings are out of reach
+            if (Levenshtein.distance(word, candidate, score_cutoff=max_distance) > max_distance
+                    and Levenshtein.distance(canonical_word, canonical(candidate),
+                                             score_cutoff=max_distance) > max_distance):
+                continue
+            distance = ocr_distance(word, candidate)
+            if distance <= max_distance:
+                results.append((distance, -self._counts[word_id], candidate))
+        results.sort()
+        return results
+
+    def lookup(self, word):
+        """
+        Best correction for a word and its similarity to the original,
+        the same (correction, similarity) pair validate_text expects
+        """
+        if not is_correctable(word):
+            return word, 1.0
+        candidates = self.candidates(word)
+        if not candidates:
+            return word, 0.5  # Medium confidence for unknown words
+        distance, _, best_match = candidates[0]
+        similarity = 1 - distance / max(len(word), len(best_match))
+        return _match_case(word, best_match), similarity
+
+    def close(self):
+        """
+        Release the memory mapping of a loaded index
+        """
+        if self._buffer is None:
+            return
+        for name, _ in self._SECTIONS:
+            section = getattr(self, '_' + name)
+            if isinstance(section, memoryview):
+                section.release()
+        self._buffer.close()
+        self._buffer = None
+
+def read_word_list(path):
+    """
+    Read a domain word list: one word per line with an optional count
+    after it, '#' starts a comment
+    """
+    words = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            count = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else None
+            words[fields[0].lower()] = count
+    return words
+
+def index_fingerprint(language='en', domain_files=None):
+    """
+    Identify the sources an index is built from, so a stale file is rebuilt
+    """
+    domain_files = DOMAIN_WORD_FILES if domain_files is None else domain_files
+    try:
+        from importlib.metadata import version
+        spellchecker_version = version('pyspellchecker')
+    except Exception:
+        spellchecker_version = None
+    sources = []
+    for path in domain_files:
+        stat = os.stat(path)
+        sources.append([os.path.abspath(path), stat.st_size, stat.st_mtime_ns])
+    payload = json.dumps([
+        _FORMAT_VERSION, MAX_EDIT_DISTANCE, PREFIX_LENGTH, language, spellchecker_version, sources
+    ])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def word_frequencies(language='en', domain_files=()):
+    """
+    Word counts from pyspellchecker's dictionary plus the domain word lists.
+    Domain words without a count rank with the most frequent dictionary word.
+    """
+    from spellchecker import SpellChecker
+    frequencies = dict(SpellChecker(language=language).word_frequency.dictionary)
+    top_count = max(frequencies.values(), default=1)
+    for path in domain_files:
+        for word, count in read_word_list(path).items():
+            frequencies[word] = count or top_count
+    return frequencies
+
+def load_spell_index(path=SPELL_INDEX_PATH, language='en', domain_files=None):
+    """
+    Memory-map the spelling index, building and saving it first when the
+    file is missing or was built from different sources. Falls back to the
+    in-memory index if it cannot be written.
+    """
+    domain_files = DOMAIN_WORD_FILES if domain_files is None else domain_files
+    fingerprint = index_fingerprint(language, domain_files)
+    try:
+        index = SpellIndex.load(path)
+        if index.fingerprint == fingerprint:
+            return index
+        index.close()
+    except (OSError, ValueError):
+        pass
+
+    log_utils.logger.info("Building spelling index at %s", path)
+    index = SpellIndex.build(word_frequencies(language, domain_files), fingerprint=fingerprint)
+    try:
+        index.save(path)
+        return SpellIndex.load(path)
+    except OSError as e:
+        log_utils.logger.warning("Could not save spelling index to %s: %s", path, e)
+        return index
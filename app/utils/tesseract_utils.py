@@ -0,0 +1,296 @@
+import os
+import queue
+import threading
+
+import numpy as np
+import pytesseract
+
+from utils.metrics_utils import record_copy
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+# Languages offered in the UI, warmed up front when the engine registry
+# loads Tesseract (see ocr_utils._load_tesseract)
+TESSERACT_LANGUAGES = ('eng', 'fra', 'deu', 'spa', 'hin')
+
+# Seconds a job waits for a busy Tesseract instance before giving up
+ACQUIRE_TIMEOUT = 60
+
+# Put into the idle queues when the pool closes, to wake waiting jobs
+_CLOSED = object()
+
+# Column names of Tesseract's TSV output, matching pytesseract.Output.DICT
+_TSV_COLUMNS = (
+    'level', 'page_num', 'block_num', 'par_num', 'line_num', 'word_num',
+    'left', 'top', 'width', 'height', 'conf', 'text'
+)
+
+def build_tesseract_config(lang, mode):
+    """
+    Tesseract command line options for the given language and OCR mode
+    """
+    return f'-l {lang} --oem 1 --psm 6' if mode == 'Accurate' else f'-l {lang} --oem 3 --psm 6'
+
+def words_from_data(data):
+    """
+    Collect the recognized words from an image_to_data dictionary.
+    Each word carries its text, confidence (0-100), bounding box as
+    (left, top, width, height) and the block/paragraph/line it belongs to.
+    """
+    words = []
+    for i, text in enumerate(data['text']):
+        conf = float(data['conf'][i])
+        if conf < 0 or not str(text).strip():
+            continue
+        words.append({
+            'text': str(text),
+            'confidence': conf,
+            'box': (int(data['left'][i]), int(data['top'][i]), int(data['width'][i]), int(data['height'][i])),
+            'block': int(data['block_num'][i]),
+            'par': int(data['par_num'][i]),
+            'line': int(data['line_num'][i]),
+        })
+    return words
+
+def text_from_words(words):
+    """
+    Rebuild page text the way image_to_string lays it out:
+    words joined by spaces, lines by newlines and paragraphs by a blank line
+    """
+    paragraphs = []
+    current_par = current_line = None
+    for word in words:
+        par_key = (word['block'], word['par'])
+        line_key = par_key + (word['line'],)
+        if par_key != current_par:
+            paragraphs.append([[word['text']]])
+            current_par, current_line = par_key, line_key
+        elif line_key != current_line:
+            paragraphs[-1].append([word['text']])
+            current_line = line_key
+        else:
+            paragraphs[-1][-1].append(word['text'])
+    return '\n\n'.join('\n'.join(' '.join(line) for line in par) for par in paragraphs)
+
+def parse_tsv(tsv):
+    """
+    Turn Tesseract TSV output into the image_to_data dictionary layout
+    """
+    data = {column: [] for column in _TSV_COLUMNS}
+    for row in tsv.splitlines():
+        fields = row.split('\t')
+        if len(fields) < len(_TSV_COLUMNS) - 1 or fields[0] == 'level':
+            continue
+        if len(fields) == len(_TSV_COLUMNS) - 1:
+            fields.append('')
+        for column, value in zip(_TSV_COLUMNS, fields):
+            data[column].append(value)
+    return data
+
+class TesseractWorkerPool:
+    """
+    Pool of warm in-process Tesseract instances (tesserocr), keyed by
+    language and engine mode. Each instance keeps its traineddata loaded,
+    so a job costs one recognition instead of a process spawn and model load.
+    At most pool_size instances exist per language/mode.
+    """
+
+    def __init__(self, pool_size=2, tessdata_path=None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.pool_size = max(1, int(pool_size))
+        self.tessdata_path = tessdata_path
+        self._idle = {}
+        self._created = {}
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _create_api(self, lang, mode):
+        kwargs = {
+            'lang': lang,
+            'psm': tesserocr.PSM.SINGLE_BLOCK,
+            'oem': tesserocr.OEM.LSTM_ONLY if mode == 'Accurate' else tesserocr.OEM.DEFAULT,
+        }
+        if self.tessdata_path:
+            kwargs['path'] = self.tessdata_path
+        return tesserocr.PyTessBaseAPI(**kwargs)
+
+    def _acquire(self, lang, mode):
+        key = (lang, 'Accurate' if mode == 'Accurate' else 'Fast')
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Tesseract pool is closed")
+            idle = self._idle.setdefault(key, queue.Queue())
+            try:
+                return key, idle.get_nowait()
+            except queue.Empty:
+                pass
+            create = self._created.get(key, 0) < self.pool_size
+            if create:
+                self._created[key] = self._created.get(key, 0) + 1
+        if create:
+            try:
+                return key, self._create_api(lang, mode)
+            except Exception:
+                with self._lock:
+                    self._created[key] -= 1
+                raise
+        # Pool is at capacity, wait for a worker to be returned
+        try:
+            api = idle.get(timeout=ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError(f"No Tesseract instance for {lang} became free in {ACQUIRE_TIMEOUT} s")
+        if api is _CLOSED:
+            # Pass the wake-up on to the next waiter
+            idle.put(_CLOSED)
+            raise RuntimeError("Tesseract pool is closed")
+        return key, api
+
+    def _release(self, key, api):
+        api.Clear()
+        with self._lock:
+            idle = self._idle.get(key)
+        if idle is None:
+            # The pool was closed while this instance was busy
+            api.End()
+        else:
+            idle.put(api)
+
+    def image_to_data(self, image, lang='eng', mode='Fast'):
+        """
+        Recognize an image and return the pytesseract.Output.DICT layout.
+        The pixels are handed over as raw bytes; SetImage on a PIL image
+        would re-encode it to BMP first.
+        """
+        # tobytes() lays out views such as block crops contiguously in one copy
+        pixels = np.asarray(image)
+        if pixels.dtype != np.uint8:
+            pixels = pixels.astype(np.uint8)
+        height, width = pixels.shape[:2]
+        channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+        data = pixels.tobytes()
+        record_copy('tesseract_bytes', len(data))
+        key, api = self._acquire(lang, mode)
+        try:
+            api.SetImageBytes(data, width, height, channels, width * channels)
+            return parse_tsv(api.GetTSVText(0))
+        finally:
+            self._release(key, api)
+
+    def warm(self, languages=TESSERACT_LANGUAGES, mode='Fast'):
+        """
+        Create one instance per language ahead of the first request.
+        Returns the languages that could not be loaded.
+        """
+        failed = []
+        for lang in languages:
+            try:
+                key, api = self._acquire(lang, mode)
+                self._release(key, api)
+            except Exception:
+                failed.append(lang)
+        return failed
+
+    def get_stats(self):
+        """
+        Number of instances created and currently idle per language/mode
+        """
+        with self._lock:
+            return {
+                f"{lang}/{mode}": {'created': created, 'idle': self._idle[(lang, mode)].qsize()}
+                for (lang, mode), created in self._created.items()
+            }
+
+    def close(self):
+        """
+        Release every idle Tesseract instance. Jobs waiting for an instance
+        fail (and fall back to pytesseract in 'auto' mode); busy instances
+        are released when their job finishes.
+        """
+        with self._lock:
+            self._closed = True
+            for idle in self._idle.values():
+                while not idle.empty():
+                    api = idle.get_nowait()
+                    if api is not _CLOSED:
+                        api.End()
+                idle.put(_CLOSED)
+            self._idle.clear()
+            self._created.clear()
+
+# Backend selection: 'auto' uses the warm pool when tesserocr is installed
+TESSERACT_BACKEND = os.environ.get('OCR_TESSERACT_BACKEND', 'auto')
+TESSERACT_POOL_SIZE = int(os.environ.get('OCR_TESSERACT_POOL_SIZE', 2))
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_tesseract_pool():
+    """
+    Return the shared worker pool, or None when the pytesseract path is in use
+    """
+    global _POOL
+    if TESSERACT_BACKEND == 'pytesseract' or tesserocr is None:
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = TesseractWorkerPool(
+                    pool_size=TESSERACT_POOL_SIZE,
+                    tessdata_path=os.environ.get('OCR_TESSDATA_PATH') or None
+                )
+    return _POOL
+
+def configure_tesseract_backend(backend=None, pool_size=None):
+    """
+    Switch between 'auto', 'tesserocr' and 'pytesseract' and resize the pool.
+    The existing pool is closed so the new settings apply to the next job.
+    """
+    global TESSERACT_BACKEND, TESSERACT_POOL_SIZE, _POOL
+    with _POOL_LOCK:
+        if backend is not None:
+            if backend == 'tesserocr' and tesserocr is None:
+                raise RuntimeError("tesserocr is not installed")
+            TESSERACT_BACKEND = backend
+        if pool_size is not None:
+            TESSERACT_POOL_SIZE = int(pool_size)
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+def _image_to_data(image, lang, mode):
+    """
+    image_to_data through the warm pool, falling back to pytesseract
+    """
+    pool = get_tesseract_pool()
+    if pool is not None:
+        try:
+            return pool.image_to_data(image, lang, mode)
+        except Exception:
+            if TESSERACT_BACKEND == 'tesserocr':
+                raise
+    # pytesseract writes a PNG to its own uniquely named temp file per call
+    record_copy('pytesseract_png', np.asarray(image).nbytes)
+    return pytesseract.image_to_data(
+        image,
+        config=build_tesseract_config(lang, mode),
+        output_type=pytesseract.Output.DICT
+    )
+
+def run_tesseract(image, lang='eng', mode='Fast'):
+    """
+    Run Tesseract once and derive text, confidence and word boxes
+    from a single image_to_data call
+    """
+    data = _image_to_data(image, lang, mode)
+    words = words_from_data(data)
+    confidences = [word['confidence'] for word in words]
+    return {
+        'text': text_from_words(words),
+        'confidence': sum(confidences) / len(confidences) if confidences else 0,
+        'min_confidence': min(confidences) if confidences else 0,
+        'words': words
+    }
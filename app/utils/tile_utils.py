@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+
+from utils.image_utils import as_array
+from utils.ocr_utils import extract_text
+
+# Height of each horizontal strip, and how far above its nominal end the
+# cut may move to find the gap between two text lines, in pixels
+TILE_HEIGHT = 1600
+SEAM_BAND = 200
+
+# Images taller than this are worth processing in tiles
+TILED_MIN_HEIGHT = 4000
+
+def _find_seam(image, start, stop):
+    """
+    Row between start and stop with the least ink, so strips are cut in
+    the gap between text lines rather than through them
+    """
+    band = image[start:stop]
+    if band.ndim == 3:
+        band = cv2.cvtColor(band, cv2.COLOR_RGB2GRAY)
+    darkness = (255 - band.astype(np.uint16)).sum(axis=1)
+    return start + int(np.argmin(darkness))
+
+def iter_tiles(image, tile_height=TILE_HEIGHT, seam_band=SEAM_BAND):
+    """
+    Yield (top, bottom) row ranges of adjacent horizontal strips.
+    Each cut is moved to the emptiest row within seam_band rows above the
+    nominal strip end, and the next strip starts at that same row. Both
+    edges of a strip then fall between text lines, so strips need no
+    overlap and no line is read twice.
+    """
+    height = image.shape[0]
+    top = 0
+    while top < height:
+        bottom = min(top + tile_height, height)
+        if bottom < height:
+            bottom = _find_seam(image, max(top + 1, bottom - seam_band), bottom)
+        yield top, bottom
+        top = bottom
+
+def extract_text_tiled(image, lang='eng', preprocessing_options=None, mode='Fast',
+                       tile_height=TILE_HEIGHT, seam_band=SEAM_BAND, **kwargs):
+    """
+    Run extract_text strip by strip and yield each strip's text as soon
+    as it is recognized. Strips are numpy views of the source, so only one
+    strip's preprocessing and OCR buffers are alive at a time.
+    Extra keyword arguments are passed on to extract_text.
+    """
+    image = as_array(image)
+
+    for index, (top, bottom) in enumerate(iter_tiles(image, tile_height, seam_band)):
+        result = extract_text(
+            image[top:bottom],
+            lang=lang,
+            preprocessing_options=preprocessing_options,
+            mode=mode,
+            **kwargs
+        )
+        if result is None:
+            continue
+
+        lines = [line for line in result['text'].splitlines() if line.strip()]
+        yield {
+            'tile': index,
+            'top': top,
+            'bottom': bottom,
+            'text': '\n'.join(lines),
+            'confidence': result['confidence'],
+            'word_count': sum(len(line.split()) for line in lines)
+        }
+
+def combine_tiles(tiles, lang='eng'):
+    """
+    Merge tile results into one extract_text style result,
+    weighting confidence by the words each tile contributed
+    """
+    texts = [tile['text'] for tile in tiles if tile['text']]
+    words = sum(tile['word_count'] for tile in tiles)
+    confidence = sum(tile['confidence'] * tile['word_count'] for tile in tiles) / words if words else 0
+    return {
+        'text': '\n'.join(texts),
+        'confidence': confidence,
+        'details': {},
+        'language': lang,
+        'word_count': words,
+        'tiles': len(tiles)
+    }
@@ -0,0 +1,48 @@
+"""
+Frame scoring cost and OCR calls saved by the capture session, using a
+synthetic camera: rendered pages with varying blur, each view held for
+several frames the way a document sits under a webcam.
+
+    python benchmarks/bench_capture.py --views 5 --hold 24
+"""
+import argparse
+import time
+
+from synthetic import make_text, render_document
+from utils.capture_utils import CaptureSession, score_frame
+
+def synthetic_frames(views, hold, size=(1280, 720)):
+    """
+    Yield hold frames of each view with the blur changing from frame to frame
+    """
+    for view in range(views):
+        text = make_text(n_lines=8, words_per_line=6, seed=view)
+        for i in range(hold):
+            yield render_document(text, size=size, font_size=28, blur=(i % 4) * 0.8, noise=4.0, seed=i)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--views', type=int, default=5)
+    parser.add_argument('--hold', type=int, default=24)
+    args = parser.parse_args()
+
+    frames = list(synthetic_frames(args.views, args.hold))
+    start = time.perf_counter()
+    for frame in frames:
+        score_frame(frame)
+    print(f"score_frame      {(time.perf_counter() - start) * 1000 / len(frames):8.2f} ms/frame")
+
+    # Count OCR calls without running an engine
+    calls = []
+    session = CaptureSession(frames)
+    while True:
+        frame, _, _ = session.recognize(ocr=lambda image, **kwargs: calls.append(image) or {'text': ''})
+        if frame is None:
+            break
+    stats = session.get_stats()
+    print(f"captures         {stats['captures']:8d}")
+    print(f"ocr runs         {stats['ocr_runs']:8d}")
+    print(f"ocr skipped      {stats['ocr_skipped']:8d}")
+
+if __name__ == '__main__':
+    main()
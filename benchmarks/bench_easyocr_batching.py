@@ -0,0 +1,65 @@
+"""
+Throughput and latency of EasyOCR under synthetic concurrent load, with
+the recognition micro-batcher at several window sizes (0 = no batching).
+
+    python benchmarks/bench_easyocr_batching.py --clients 8 --requests 64 --windows 0 10 20
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from synthetic import make_text, render_document
+from utils import easyocr_utils
+from utils.ocr_utils import get_engine
+
+def run_load(reader, images, clients, window_ms, max_batch):
+    """
+    Send every image through run_easyocr from `clients` threads at once.
+    Returns per-request latencies in seconds and the total wall time.
+    """
+    easyocr_utils.BATCH_WINDOW_MS = window_ms
+    easyocr_utils._BATCHERS.clear()
+    if window_ms > 0:
+        easyocr_utils._BATCHERS[id(reader)] = easyocr_utils.RecognitionBatcher(
+            reader, window=window_ms / 1000, max_batch=max_batch
+        )
+
+    def timed(image):
+        start = time.perf_counter()
+        easyocr_utils.run_easyocr(reader, image)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = list(pool.map(timed, images))
+    return latencies, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--windows', type=float, nargs='+', default=[0, 10, 20])
+    parser.add_argument('--max-batch', type=int, default=easyocr_utils.MAX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    readers = get_engine('easyocr')
+    if readers is None:
+        raise SystemExit("EasyOCR is not available")
+    reader = readers.get('eng')
+    images = [
+        render_document(make_text(n_lines=6, seed=i), size=(1200, 500), font_size=32)
+        for i in range(args.requests)
+    ]
+    easyocr_utils.run_easyocr(reader, images[0])  # warm up
+
+    print(f"{'window ms':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for window_ms in args.windows:
+        latencies, wall = run_load(reader, images, args.clients, window_ms, args.max_batch)
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{window_ms:>9.0f} {len(images) / wall:>8.2f} "
+              f"{statistics.median(latencies) * 1000:>8.1f} {p95 * 1000:>8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Latency and throughput of EasyOCR on CPU for combinations of torch thread
+count and int8 quantization, with several concurrent clients.
+
+    python benchmarks/bench_engine_config.py --threads 1 2 4 --clients 1 4
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from synthetic import make_text, render_document
+from utils.easyocr_utils import build_reader
+
+def bench_setting(images, threads, quantize, clients):
+    """
+    Median per-image latency and images per second for one reader setting
+    """
+    reader = build_reader(['en'], {'gpu': False, 'torch_threads': threads, 'quantize': quantize})
+    reader.readtext(images[0])  # warm up
+
+    def timed(image):
+        start = time.perf_counter()
+        reader.readtext(image, detail=1)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = list(pool.map(timed, images))
+    wall = time.perf_counter() - start
+    return statistics.median(latencies), len(images) / wall
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--images', type=int, default=8)
+    args = parser.parse_args()
+
+    images = [
+        render_document(make_text(n_lines=10, seed=i), size=(1600, 900), font_size=32)
+        for i in range(args.images)
+    ]
+
+    print(f"{'threads':>7} {'int8':>5} {'clients':>7} {'p50 ms':>8} {'img/s':>7}")
+    for threads in args.threads:
+        for quantize in (False, True):
+            for clients in args.clients:
+                p50, throughput = bench_setting(images, threads, quantize, clients)
+                print(f"{threads:>7} {str(quantize):>5} {clients:>7} {p50 * 1000:>8.1f} {throughput:>7.2f}")
+
+if __name__ == '__main__':
+    main()
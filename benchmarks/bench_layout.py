@@ -0,0 +1,45 @@
+"""
+Engine time and accuracy with and without text-region detection on a
+mixed-content page: a short text block, a photo-like region and wide
+margins.
+
+    python benchmarks/bench_layout.py --size a4 --strategy concurrent
+"""
+import argparse
+
+import numpy as np
+
+from synthetic import PAGE_SIZES, character_error_rate, make_text, render_document
+from utils.ocr_utils import extract_text
+
+def mixed_page(size, seed=0):
+    """
+    Page with text in the upper third and a noisy picture below it
+    """
+    truth = make_text(n_lines=10, words_per_line=6, seed=seed)
+    page = render_document(truth, PAGE_SIZES[size], font_size=36).copy()
+    height, width = page.shape[:2]
+    rng = np.random.default_rng(seed)
+    top, left = height // 2, width // 8
+    picture = rng.integers(0, 256, (height // 3, width * 3 // 4, 3), dtype=np.uint8)
+    page[top:top + picture.shape[0], left:left + picture.shape[1]] = picture
+    return page, truth
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=sorted(PAGE_SIZES), default='a4')
+    parser.add_argument('--strategy', choices=['sequential', 'concurrent', 'cascade'], default='concurrent')
+    args = parser.parse_args()
+
+    page, truth = mixed_page(args.size)
+    print(f"{'layout':>6} {'blocks':>6} {'engines ms':>10} {'total ms':>9} {'CER':>6}")
+    for layout in (False, True):
+        result = extract_text(page, preprocessing_options={'layout': layout}, strategy=args.strategy, use_cache=False)
+        timings = result['timings']
+        engine_ms = sum(timings[name]['wall_ms'] for name in ('easyocr', 'tesseract', 'blocks') if name in timings)
+        total_ms = sum(numbers['wall_ms'] for numbers in timings.values())
+        print(f"{str(layout):>6} {len(result.get('blocks', [])):>6} {engine_ms:>10.1f} {total_ms:>9.1f} "
+              f"{character_error_rate(truth, result['text']):>6.3f}")
+
+if __name__ == '__main__':
+    main()
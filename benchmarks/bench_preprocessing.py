@@ -0,0 +1,51 @@
+"""
+Compare preprocessing profiles, including the adaptive 'auto' profile:
+latency of preprocess_image and the Tesseract character error rate on the
+processed page.
+
+    python benchmarks/bench_preprocessing.py --size a4 --noise 12 --repeat 3
+"""
+import argparse
+import time
+
+from synthetic import PAGE_SIZES, character_error_rate, make_text, render_document
+from utils.ocr_utils import PREPROCESSING_PROFILES, preprocess_image, get_engine
+from utils.tesseract_utils import run_tesseract
+
+def bench_profile(image, truth, profile, repeat=3, lang='eng'):
+    """
+    Best-of-repeat preprocessing latency and the resulting OCR accuracy
+    """
+    options = {'grayscale': True, 'denoise': True, 'profile': profile}
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processed = preprocess_image(image, options)
+        timings.append(time.perf_counter() - start)
+
+    cer = None
+    if get_engine('tesseract'):
+        cer = character_error_rate(truth, run_tesseract(processed, lang)['text'])
+    return {'profile': profile, 'preprocess_ms': min(timings) * 1000, 'cer': cer}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', choices=sorted(PAGE_SIZES), default='a4')
+    parser.add_argument('--font-size', type=int, default=36)
+    parser.add_argument('--noise', type=float, default=12.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    truth = make_text(n_lines=30)
+    image = render_document(truth, PAGE_SIZES[args.size], font_size=args.font_size, noise=args.noise)
+
+    print(f"{'profile':<10} {'preprocess ms':>14} {'CER':>8}")
+    # 'auto' runs the quality analyzer first; after the first repeat its
+    # decision comes from the memo
+    for profile in list(PREPROCESSING_PROFILES) + ['auto']:
+        row = bench_profile(image, truth, profile, repeat=args.repeat)
+        cer = f"{row['cer']:.3f}" if row['cer'] is not None else 'n/a'
+        print(f"{row['profile']:<10} {row['preprocess_ms']:>14.1f} {cer:>8}")
+
+if __name__ == '__main__':
+    main()
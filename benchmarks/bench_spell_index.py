@@ -0,0 +1,58 @@
+"""
+Spelling index load time and per-token correction latency, compared with
+pyspellchecker's candidate generation, on OCR-style misspellings.
+
+    python benchmarks/bench_spell_index.py --tokens 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from synthetic import SAMPLE_WORDS
+from utils.spell_utils import OCR_CONFUSIONS, OCR_SPLITS, SpellIndex, word_frequencies
+
+def garble(word, rng):
+    """
+    Apply one OCR confusion or a random character drop to a word
+    """
+    for source, target in rng.sample(OCR_CONFUSIONS + OCR_SPLITS, len(OCR_CONFUSIONS + OCR_SPLITS)):
+        for old, new in ((source, target), (target, source)):
+            if old in word:
+                return word.replace(old, new, 1)
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tokens = [garble(rng.choice(SAMPLE_WORDS), rng) for _ in range(args.tokens)]
+
+    start = time.perf_counter()
+    index = SpellIndex.build(word_frequencies())
+    print(f"build        {time.perf_counter() - start:8.2f} s  ({len(index)} words)")
+
+    path = os.path.join(tempfile.mkdtemp(), 'spell_index.bin')
+    index.save(path)
+    start = time.perf_counter()
+    index = SpellIndex.load(path)
+    print(f"load         {(time.perf_counter() - start) * 1000:8.2f} ms ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+    start = time.perf_counter()
+    for token in tokens:
+        index.lookup(token)
+    print(f"index lookup {(time.perf_counter() - start) * 1000 / len(tokens):8.3f} ms/token")
+
+    from spellchecker import SpellChecker
+    spell_checker = SpellChecker()
+    start = time.perf_counter()
+    for token in tokens:
+        spell_checker.candidates(token)
+    print(f"candidates() {(time.perf_counter() - start) * 1000 / len(tokens):8.3f} ms/token")
+
+if __name__ == '__main__':
+    main()
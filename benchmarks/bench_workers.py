@@ -0,0 +1,107 @@
+"""
+Multi-worker deployment: cross-worker hits of the shared sqlite result
+cache, and (with --engines) memory per worker when the engines are loaded
+before forking versus in every worker. Linux only, memory is read from
+/proc/<pid>/smaps_rollup.
+
+    python benchmarks/bench_workers.py --workers 4 --images 200
+    python benchmarks/bench_workers.py --workers 4 --engines
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+import synthetic  # noqa: F401  makes app/utils importable
+from utils.cache_utils import OCRResultCache
+
+def cache_worker(path, worker, images, queue):
+    """
+    Look up every image in a worker-specific order, storing a fake result
+    on a miss, and report hits and per-operation latency
+    """
+    cache = OCRResultCache(disk_path=path)
+    keys = [f"image-{i}" for i in range(images)]
+    random.Random(worker).shuffle(keys)
+    hits, start = 0, time.perf_counter()
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.put(key, {'text': key * 40, 'avg_confidence': 90.0})
+    queue.put((hits, (time.perf_counter() - start) * 1000 / len(keys)))
+    cache.close()
+
+def bench_cache(workers, images):
+    path = os.path.join(tempfile.mkdtemp(), 'results.sqlite')
+    OCRResultCache(disk_path=path).close()
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    processes = [context.Process(target=cache_worker, args=(path, i, images, queue)) for i in range(workers)]
+    for process in processes:
+        process.start()
+    outcomes = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    hits = sum(hits for hits, _ in outcomes)
+    lookups = workers * images
+    print(f"shared cache   {hits}/{lookups} hits ({hits / lookups:.0%}), "
+          f"ideal {lookups - images}/{lookups}, "
+          f"{sum(ms for _, ms in outcomes) / workers:.3f} ms/lookup")
+
+def memory_kb(pid):
+    """
+    Proportional and private resident memory of a process, in kB
+    """
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields.get('Pss', 0), fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+
+def idle_worker(load, ready, done):
+    if load:
+        from utils.ocr_utils import init_ocr_engines
+        init_ocr_engines()
+    ready.set()
+    done.wait()
+
+def bench_memory(workers, preload):
+    if preload:
+        from utils.ocr_utils import preload_engines
+        preload_engines()
+    context = multiprocessing.get_context('fork')
+    done = context.Event()
+    readies = [context.Event() for _ in range(workers)]
+    processes = [context.Process(target=idle_worker, args=(not preload, ready, done)) for ready in readies]
+    for process in processes:
+        process.start()
+    for ready in readies:
+        ready.wait()
+    usage = [memory_kb(process.pid) for process in processes]
+    done.set()
+    for process in processes:
+        process.join()
+    label = 'preloaded' if preload else 'per worker'
+    print(f"{label:<14} {sum(pss for pss, _ in usage) / 1024:8.1f} MB PSS total, "
+          f"{sum(private for _, private in usage) / len(usage) / 1024:8.1f} MB private per worker")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--images', type=int, default=200)
+    parser.add_argument('--engines', action='store_true', help="Also measure engine memory (loads EasyOCR)")
+    args = parser.parse_args()
+
+    bench_cache(args.workers, args.images)
+    if args.engines:
+        # Per-worker loading first, preloading freezes this process's heap
+        bench_memory(args.workers, preload=False)
+        bench_memory(args.workers, preload=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Benchmark and regression suite for the OCR hot path.
+
+Renders synthetic documents at several page sizes, fonts, noise levels and
+languages, times preprocess_image, each OCR engine, validate_text, the full
+extract_text call and the Word export, and measures character error rate
+(CER) against the rendered ground truth.
+
+    python benchmarks/suite.py run --output results.json
+    python benchmarks/suite.py run --quick --output results.json
+    python benchmarks/suite.py compare baseline.json results.json
+
+compare exits with status 1 when a case got slower than the latency
+tolerance allows or its CER rose by more than the accuracy tolerance.
+"""
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from synthetic import PAGE_SIZES, character_error_rate, make_text, render_document
+from utils.doc_utils import create_word_document, get_document_bytes
+from utils.easyocr_utils import run_easyocr
+from utils.ocr_utils import extract_text, get_engine, preprocess_image, resolve_preprocessing_options, validate_text
+from utils.tesseract_utils import run_tesseract
+
+# Full matrix; --quick keeps the first entry of each axis.
+# Hindi is left out because it needs a Devanagari font to render.
+SIZES = ('receipt', 'a5', 'a4')
+FONTS = ('DejaVuSans.ttf', 'DejaVuSerif.ttf', 'DejaVuSansMono.ttf')
+NOISE_LEVELS = (0.0, 12.0, 25.0)
+LANGUAGES = ('eng', 'fra', 'deu', 'spa')
+MODES = ('Fast', 'Accurate')
+
+def _median_ms(func, repeat):
+    """
+    Median wall time of func over repeat calls in milliseconds, and its last return value
+    """
+    timings = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), value
+
+def run_case(size, font, noise, lang, mode, repeat):
+    """
+    Time every stage for one synthetic document and score the OCR output
+    """
+    truth = make_text(n_lines=25 if size != 'receipt' else 12, words_per_line=6, lang=lang)
+    image = render_document(truth, PAGE_SIZES[size], font_size=36, font_path=font, noise=noise)
+    options = resolve_preprocessing_options({'normalize': False}, mode)
+
+    timings, cer = {}, {}
+    timings['preprocess'], processed = _median_ms(lambda: preprocess_image(image, options), repeat)
+
+    if get_engine('tesseract'):
+        timings['tesseract'], tess = _median_ms(lambda: run_tesseract(processed, lang, mode), repeat)
+        cer['tesseract'] = character_error_rate(truth, tess['text'])
+
+    readers = get_engine('easyocr')
+    if readers is not None:
+        reader = readers.get(lang)
+        timings['easyocr'], easy = _median_ms(lambda: run_easyocr(reader, processed), repeat)
+        cer['easyocr'] = character_error_rate(truth, easy['text'] if easy else '')
+
+    spell_checker = get_engine('spellcheck')
+    if spell_checker is not None:
+        timings['validate_text'], _ = _median_ms(lambda: validate_text(truth, spell_checker), repeat)
+
+    timings['extract_text'], result = _median_ms(
+        lambda: extract_text(image, lang=lang, mode=mode, use_cache=False), repeat
+    )
+    if result is not None:
+        cer['extract_text'] = character_error_rate(truth, result['text'])
+
+    timings['create_word_document'], doc = _median_ms(lambda: create_word_document(truth), repeat)
+    timings['get_document_bytes'], _ = _median_ms(lambda: get_document_bytes(doc), repeat)
+
+    return {
+        'id': f"{size}/{font}/noise{noise:g}/{lang}/{mode}",
+        'size': size, 'font': font, 'noise': noise, 'lang': lang, 'mode': mode,
+        'timings_ms': timings,
+        'cer': cer
+    }
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    axes = (SIZES, FONTS, NOISE_LEVELS, LANGUAGES, MODES)
+    if args.quick:
+        axes = tuple(axis[:1] for axis in axes)
+    cases = []
+    for size, font, noise, lang, mode in itertools.product(*axes):
+        case = run_case(size, font, noise, lang, mode, args.repeat)
+        cases.append(case)
+        print(f"{case['id']:<48} extract_text {case['timings_ms']['extract_text']:>9.1f} ms  "
+              f"CER {case['cer'].get('extract_text', float('nan')):.3f}")
+
+    report = {
+        'meta': {
+            'timestamp': time.time(),
+            'commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'repeat': args.repeat
+        },
+        'cases': cases
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(cases)} cases to {args.output}")
+
+def compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = {case['id']: case for case in json.load(f)['cases']}
+    with open(args.candidate, encoding='utf-8') as f:
+        candidate = {case['id']: case for case in json.load(f)['cases']}
+
+    regressions = []
+    for case_id in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[case_id], candidate[case_id]
+        for stage, old_ms in old['timings_ms'].items():
+            new_ms = new['timings_ms'].get(stage)
+            if new_ms is None or old_ms < args.min_ms:
+                continue
+            change = new_ms / old_ms - 1
+            if change > args.latency_tolerance:
+                regressions.append(f"{case_id} {stage}: {old_ms:.1f} -> {new_ms:.1f} ms (+{change:.0%})")
+        for engine, old_cer in old['cer'].items():
+            new_cer = new['cer'].get(engine)
+            if new_cer is not None and new_cer - old_cer > args.cer_tolerance:
+                regressions.append(f"{case_id} {engine} CER: {old_cer:.3f} -> {new_cer:.3f}")
+
+    missing = baseline.keys() - candidate.keys()
+    if missing:
+        print(f"{len(missing)} baseline cases missing from the candidate run")
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    print(f"{len(regressions)} regressions across {len(baseline.keys() & candidate.keys())} shared cases")
+    sys.exit(1 if regressions else 0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run the benchmark matrix")
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--repeat', type=int, default=3)
+    run_parser.add_argument('--quick', action='store_true', help="One case per axis")
+
+    compare_parser = subparsers.add_parser('compare', help="Flag regressions between two runs")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--latency-tolerance', type=float, default=0.15,
+                                help="Allowed relative slowdown per stage (default 15%%)")
+    compare_parser.add_argument('--cer-tolerance', type=float, default=0.01,
+                                help="Allowed absolute CER increase (default 0.01)")
+    compare_parser.add_argument('--min-ms', type=float, default=1.0,
+                                help="Ignore stages faster than this in the baseline")
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    else:
+        compare(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Synthetic document images rendered locally with PIL, so benchmarks
+have a known ground truth and need no network or sample files.
+"""
+import os
+import random
+import sys
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+# Make app/utils importable as `utils`, the same way Streamlit runs app/main.py
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+SAMPLE_WORDS = (
+    "the quick brown fox jumps over lazy dog invoice total amount due date "
+    "customer order number shipping address payment received thank you for "
+    "your business document scanner optical character recognition page"
+).split()
+
+# Word lists per Tesseract language code; Hindi needs a Devanagari font
+LANGUAGE_WORDS = {
+    'eng': SAMPLE_WORDS,
+    'fra': ("le la les facture montant total date client commande numéro adresse "
+            "livraison paiement reçu merci pour votre confiance document page").split(),
+    'deu': ("der die das Rechnung Betrag gesamt Datum Kunde Bestellung Nummer "
+            "Lieferadresse Zahlung erhalten vielen Dank für Ihren Auftrag Seite").split(),
+    'spa': ("el la los factura importe total fecha cliente pedido número dirección "
+            "envío pago recibido gracias por su confianza documento página").split(),
+    'hin': "चालान कुल राशि तिथि ग्राहक आदेश संख्या पता भुगतान प्राप्त धन्यवाद दस्तावेज़ पृष्ठ".split(),
+}
+
+# Page sizes in pixels at 300 dpi
+PAGE_SIZES = {
+    'receipt': (800, 1600),
+    'a5': (1748, 2480),
+    'a4': (2480, 3508),
+}
+
+def make_text(n_lines=20, words_per_line=8, seed=0, lang='eng'):
+    """
+    Deterministic pseudo-random lines of dictionary words in a language
+    """
+    rng = random.Random(seed)
+    words = LANGUAGE_WORDS[lang]
+    return '\n'.join(
+        ' '.join(rng.choice(words) for _ in range(words_per_line))
+        for _ in range(n_lines)
+    )
+
+def load_font(font_size=32, font_path=None):
+    """
+    Load a TrueType font, falling back to PIL's bundled default
+    """
+    candidates = [font_path] if font_path else []
+    candidates += ['DejaVuSans.ttf', 'Arial.ttf', 'arial.ttf']
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, font_size)
+        except (OSError, TypeError):
+            continue
+    return ImageFont.load_default(size=font_size)
+
+def render_document(text, size=(2480, 3508), font_size=32, font_path=None, noise=0.0, blur=0.0, seed=0):
+    """
+    Render text onto a white page and return it as an RGB numpy array.
+    noise is the standard deviation of additive Gaussian noise (0-255 scale),
+    blur is a Gaussian blur radius in pixels.
+    """
+    page = Image.new('RGB', size, 'white')
+    draw = ImageDraw.Draw(page)
+    font = load_font(font_size, font_path)
+    margin = size[0] // 12
+    draw.multiline_text((margin, margin), text, fill='black', font=font, spacing=font_size // 2)
+    if blur:
+        page = page.filter(ImageFilter.GaussianBlur(blur))
+
+    pixels = np.asarray(page, dtype=np.float32)
+    if noise:
+        rng = np.random.default_rng(seed)
+        pixels = pixels + rng.normal(0, noise, pixels.shape)
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+def character_error_rate(reference, hypothesis):
+    """
+    Edit distance between the texts divided by the reference length,
+    with whitespace normalized on both sides
+    """
+    import Levenshtein
+    reference = ' '.join(reference.split())
+    hypothesis = ' '.join(hypothesis.split())
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return Levenshtein.distance(reference, hypothesis) / len(reference)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make app/utils importable as `utils`, the same way Streamlit runs app/main.py
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
@@ -0,0 +1,59 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import batch_utils
+
+class FakePool:
+    """
+    Stands in for the shared process pool and records how many pages ran
+    at once
+    """
+
+    def __init__(self, delay=0.02):
+        self.executor = ThreadPoolExecutor(8)
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, data, name, *args):
+        def run():
+            with self.lock:
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            time.sleep(self.delay)
+            with self.lock:
+                self.running -= 1
+            return {'text': f"text of {name}"}
+        return self.executor.submit(run)
+
+def make_job(monkeypatch, pool, pages, workers):
+    monkeypatch.setattr(batch_utils, 'get_batch_executor', lambda: pool)
+    monkeypatch.setattr(batch_utils, 'count_pages', lambda data, name: 1)
+    return batch_utils.BatchJob([(f"page{i}.png", b'') for i in range(pages)], workers=workers)
+
+def wait_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.finished
+
+def test_job_caps_its_pages_in_flight(monkeypatch):
+    pool = FakePool()
+    job = make_job(monkeypatch, pool, pages=10, workers=2)
+    assert wait_finished(job)
+    assert job.poll() == 10
+    assert not job.errors
+    assert pool.peak <= 2
+    assert job.combined_text().index("page0.png") < job.combined_text().index("page9.png")
+
+def test_cancel_drops_unsubmitted_pages(monkeypatch):
+    pool = FakePool(delay=0.2)
+    job = make_job(monkeypatch, pool, pages=10, workers=1)
+    job.cancel()
+    assert wait_finished(job)
+    job.poll()
+    # The page already running finishes, the rest never reach the pool
+    assert len(job.errors) >= 9
+    assert set(job.errors.values()) == {"Cancelled"}
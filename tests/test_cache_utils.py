@@ -0,0 +1,108 @@
+import multiprocessing
+import sqlite3
+
+import numpy as np
+
+from utils import cache_utils
+from utils.cache_utils import OCRResultCache, make_cache_key
+
+def test_key_depends_on_settings():
+    image = np.zeros((8, 8), dtype=np.uint8)
+    base = make_cache_key(image, {}, 'eng', 'Fast', strategy='cascade')
+    assert base == make_cache_key(image.copy(), {}, 'eng', 'Fast', strategy='cascade')
+    assert base != make_cache_key(image, {}, 'eng', 'Fast', strategy='concurrent')
+    assert base != make_cache_key(image, {}, 'eng', 'Fast', strategy='cascade', pipeline='other')
+
+def test_disk_tier_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    writer = OCRResultCache(disk_path=path)
+    writer.put('a', {'text': 'hello'})
+    reader = OCRResultCache(disk_path=path)
+    assert reader.get('a') == {'text': 'hello'}
+    assert reader.get_stats()['disk_hits'] == 1
+    assert sqlite3.connect(path).execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    writer.close()
+    reader.close()
+
+def _put_many(path, worker):
+    cache = OCRResultCache(disk_path=path)
+    for i in range(50):
+        cache.put(f"{worker}-{i}", {'text': str(i)})
+    cache.close()
+
+def test_forked_workers_write_one_file(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    parent = OCRResultCache(disk_path=path)
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=_put_many, args=(path, worker)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert parent.get('3-49') == {'text': '49'}
+    parent.close()
+
+def test_disk_tier_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_utils, 'DISK_TRIM_INTERVAL', 1)
+    monkeypatch.setattr(cache_utils, 'ACCESS_RESOLUTION', -1)
+    path = str(tmp_path / 'results.sqlite')
+    cache = OCRResultCache(max_bytes=0, disk_path=path, disk_max_bytes=1100)
+    payload = {'text': 'x' * 180}
+    cache.put('first', payload)
+    cache.put('second', payload)
+    cache.get('first')
+    for i in range(4):
+        cache.put(f"new-{i}", payload)
+    assert cache.get('first') is not None
+    assert cache.get('second') is None
+    assert cache.get_stats()['disk_evictions'] >= 1
+    total = sqlite3.connect(path).execute('SELECT SUM(size) FROM ocr_results').fetchone()[0]
+    assert total <= 1100
+    cache.close()
+
+def test_old_disk_layout_is_replaced(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE ocr_results (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    conn.execute("INSERT INTO ocr_results VALUES ('a', '{}')")
+    conn.commit()
+    conn.close()
+    cache = OCRResultCache(disk_path=path)
+    assert cache.get('a') is None
+    cache.put('a', {'text': 'new'})
+    assert OCRResultCache(disk_path=path).get('a') == {'text': 'new'}
+    cache.close()
+
+def test_locked_disk_tier_degrades_to_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_utils, 'DISK_TIMEOUT', 0.05)
+    path = str(tmp_path / 'results.sqlite')
+    cache = OCRResultCache(disk_path=path)
+    cache.put('a', {'text': 'hello'})
+    blocker = sqlite3.connect(path)
+    blocker.execute('BEGIN EXCLUSIVE')
+    cache.put('b', {'text': 'world'})
+    assert cache.get('b') == {'text': 'world'}
+    assert cache.get_stats()['disk_errors'] == 1
+    blocker.rollback()
+    blocker.close()
+    # The write was skipped, the file still serves what it had
+    reader = OCRResultCache(max_bytes=0, disk_path=path)
+    assert reader.get('a') == {'text': 'hello'}
+    assert reader.get('b') is None
+    reader.close()
+    cache.close()
+
+def test_unreadable_disk_tier_is_a_miss(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = OCRResultCache(disk_path=path)
+    cache.put('a', {'text': 'hello'})
+    cache.close()
+    with sqlite3.connect(path) as conn:
+        conn.execute('DROP TABLE ocr_results')
+    other = OCRResultCache(disk_path=None)
+    other.disk_path = path
+    assert other.get('a') is None
+    other.put('b', {'text': 'world'})
+    assert other.get_stats()['disk_errors'] == 2
+    other.close()
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+
+from utils.capture_utils import CaptureSession
+
+def page(seed, blur=0):
+    """
+    Synthetic RGB frame of printed words on white paper
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.full((240, 320, 3), 255, dtype=np.uint8)
+    for row in range(30, 230, 24):
+        words = ' '.join(str(word) for word in rng.integers(100, 99999, size=4))
+        cv2.putText(frame, words, (10, row), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    if blur:
+        frame = cv2.GaussianBlur(frame, (0, 0), blur)
+    return frame
+
+def test_capture_keeps_the_sharpest_frame():
+    frames = [page(1, blur=3), page(1, blur=1.5), page(1), page(1, blur=2)]
+    with CaptureSession(frames, window=4) as session:
+        frame, score = session.capture()
+    assert np.array_equal(frame, frames[2])
+    assert score['sharpness'] > 0
+
+def test_capture_drops_stale_frames():
+    # Sharp frames buffered before the click, blurry ones after it
+    stale = [page(seed) for seed in range(4)]
+    fresh = [page(9, blur=1), page(9, blur=2)]
+    with CaptureSession(stale + fresh, window=2, stale=4) as session:
+        frame, _ = session.capture()
+        assert session.get_stats()['stale_dropped'] == 4
+    assert np.array_equal(frame, fresh[0])
+
+def test_recognize_skips_unchanged_frames():
+    frames = [page(1)] * 4 + [page(2)] * 2
+    calls = []
+
+    def ocr(image, **kwargs):
+        calls.append(image)
+        return {'text': str(len(calls))}
+
+    with CaptureSession(frames, window=2) as session:
+        results = [session.recognize(ocr=ocr) for _ in range(3)]
+    assert [changed for _, _, changed in results] == [True, False, True]
+    assert len(calls) == 2
+    assert results[1][1]['text'] == '1'
@@ -0,0 +1,28 @@
+import cv2
+import numpy as np
+
+from utils.quality_utils import analyze_quality, decide_preprocessing, estimate_contrast
+
+def render_page(ink=0, paper=255, noise=0.0):
+    page = np.full((1400, 1000), paper, dtype=np.uint8)
+    for row in range(12):
+        cv2.putText(page, "The quick brown fox jumps over", (60, 100 + row * 100),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, ink, 2, cv2.LINE_AA)
+    if noise:
+        rng = np.random.default_rng(0)
+        page = np.clip(page + rng.normal(0, noise, page.shape), 0, 255).astype(np.uint8)
+    return cv2.cvtColor(page, cv2.COLOR_GRAY2RGB)
+
+def test_clean_page_does_not_get_clahe():
+    for noise in (0.0, 25.0):
+        quality = analyze_quality(render_page(noise=noise))
+        assert quality['contrast'] > 0.5
+        assert not decide_preprocessing(quality)['contrast']
+
+def test_faded_page_gets_clahe():
+    quality = analyze_quality(render_page(ink=170, paper=220))
+    assert quality['contrast'] < 0.25
+    assert decide_preprocessing(quality)['contrast']
+
+def test_blank_page_has_no_contrast():
+    assert estimate_contrast(np.full((64, 64), 200, dtype=np.uint8)) == 0.0
@@ -0,0 +1,59 @@
+import pytest
+
+from utils.ocr_utils import validate_text
+from utils.spell_utils import SpellIndex, canonical, is_correctable, ocr_distance
+
+WORDS = {
+    'lots': 500, 'lot': 300, 'six': 200, 'lox': 20, 'model': 100, 'modem': 10,
+    'so': 1000, 'lo': 50, 'invoice': 80, 'total': 90, 'hits': 40, 'mode': 60
+}
+
+@pytest.fixture(scope='module')
+def index():
+    return SpellIndex.build(WORDS)
+
+def test_ocr_confusions_are_cheaper_than_edits():
+    assert ocr_distance('m0del', 'model') == pytest.approx(0.25)
+    assert ocr_distance('rnodel', 'model') == pytest.approx(0.4)
+    assert ocr_distance('mxdel', 'model') == 1
+    assert canonical('rnode1') == 'model'
+
+def test_candidates_are_sorted_by_distance_then_frequency(index):
+    candidates = [word for _, _, word in index.candidates('lits')]
+    assert candidates[0] == 'lots'
+    assert 'hits' in candidates
+
+def test_candidates_survive_canonical_folding(index):
+    # canonical('lix') is 'hx', further from 'six' and 'lox' than the raw spelling
+    assert {'six', 'lox'} <= {word for _, _, word in index.candidates('lix')}
+
+def test_candidates_through_several_confusions(index):
+    assert index.candidates('rnode1')[0][2] == 'model'
+
+def test_candidates_respect_distance(index):
+    assert all(distance <= 1 for distance, _, _ in index.candidates('lits', max_distance=1))
+    assert index.candidates('qqqqq') == []
+
+def test_lookup_keeps_case(index):
+    assert index.lookup('Rnodel')[0] == 'Model'
+
+@pytest.mark.parametrize('token', ['10', '50', '2024-01-05', '$1,250.00', '3.5', '15/10'])
+def test_numbers_are_not_corrected(index, token):
+    assert not is_correctable(token)
+    assert index.lookup(token) == (token, 1.0)
+
+def test_validate_text_keeps_numbers(index):
+    result = validate_text('lnvoice total 50\n10 lots', index)
+    assert result['text'] == 'invoice total 50\n10 lots'
+    assert result['word_confidence'][2] == 1.0
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = str(tmp_path / 'index.bin')
+    index.save(path)
+    loaded = SpellIndex.load(path)
+    try:
+        assert len(loaded) == len(index)
+        assert loaded.known(['Lots', 'nope']) == {'lots'}
+        assert loaded.candidates('rnode1') == index.candidates('rnode1')
+    finally:
+        loaded.close()
@@ -0,0 +1,45 @@
+import numpy as np
+
+from utils import tile_utils
+
+LINE_HEIGHT = 30
+LINE_PITCH = 70
+
+def tall_page(n_lines=90, width=300):
+    """
+    White page with n_lines dark bars standing in for text lines. Each bar
+    has its own gray level, so a fake OCR can tell which line it sees.
+    """
+    page = np.full((n_lines * LINE_PITCH + 40, width, 3), 255, dtype=np.uint8)
+    for i in range(n_lines):
+        top = 20 + i * LINE_PITCH
+        page[top:top + LINE_HEIGHT, 10:width - 10] = i
+    return page
+
+def fake_extract_text(strip, **kwargs):
+    """
+    'Recognize' every bar in a strip, partial bars included, as 'line <n>'
+    """
+    levels = strip[:, :, 0].min(axis=1)
+    lines, previous = [], 255
+    for level in levels:
+        if level != 255 and level != previous:
+            lines.append(f"line {level}")
+        previous = level
+    return {'text': '\n'.join(lines), 'confidence': 90.0}
+
+def test_strips_are_adjacent_and_cut_between_lines():
+    page = tall_page()
+    tiles = list(tile_utils.iter_tiles(page, tile_height=1000, seam_band=200))
+    assert tiles[0][0] == 0 and tiles[-1][1] == page.shape[0]
+    for (_, bottom), (top, _) in zip(tiles, tiles[1:]):
+        assert top == bottom
+        assert page[bottom].min() == 255
+
+def test_tiled_text_has_every_line_once(monkeypatch):
+    monkeypatch.setattr(tile_utils, 'extract_text', fake_extract_text)
+    page = tall_page()
+    tiles = list(tile_utils.extract_text_tiled(page, tile_height=1000))
+    assert len(tiles) > 1
+    combined = tile_utils.combine_tiles(tiles)
+    assert combined['text'].splitlines() == [f"line {i}" for i in range(90)]